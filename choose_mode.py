@@ -1,16 +1,50 @@
 import time
 from pynput import keyboard
 
-from utils.visualizers import TimeSeriesVisualizerPG
+from utils.visualizers import TimeSeriesVisualizerPG, BarVisualizerPG, PressureMapVisualizerPG
 from utils.serialReader import SerialDataHandler
-from utils.RbfVis import TactileVisualizer, STLProcessor
-from config import SERIAL_PORT, CALIBRATION_FRAMES
+from utils.RbfVis import TactileVisualizer, STLProcessor, real_sensor_coords
+from utils.PointCloudVis import PointCloudTactileVisualizer
+from utils.MultiPadVis import MultiPadTactileVisualizer, row_layout
+from utils.rate_control import RateController, Pacer
+from utils.frame_server import FrameServer
+from utils.pipeline import Pipeline, latest_value
+from config import SERIAL_PORT, PAD_PORTS, CALIBRATION_FRAMES, DISPLAY_RATE_HZ, RATE_MODE
+from config import SERVER_HOST, SERVER_TCP_PORT, SERVER_UDP_PORT
+from config import RAW_DTYPE, VALUE_DTYPE, GEOMETRY_DTYPE, RECORD_FORMAT
+from utils.dtype_policy import DtypePolicy
 
 exit_flag = False
 reset_flag = False
+reconnect_flag = False
+
+DTYPES = DtypePolicy(RAW_DTYPE, VALUE_DTYPE, GEOMETRY_DTYPE)
+
+
+def open_handler():
+    return SerialDataHandler(port=SERIAL_PORT, calibration_frames=CALIBRATION_FRAMES, dtypes=DTYPES)
+
+
+def handle_reset_keys(*serial_handles):
+    """
+    R: 在原 handler 上重新校准基线；C: 重新打开串口并保留基线。
+    两者都不重建 handler，RateController 和可视化窗口保持不变
+    """
+    global reset_flag, reconnect_flag
+    if reset_flag:
+        print("Recalibrating baseline...")
+        for serial_handle in serial_handles:
+            serial_handle.recalibrate()
+        reset_flag = False
+    if reconnect_flag:
+        for serial_handle in serial_handles:
+            if serial_handle.link is not None:
+                serial_handle.link.reconnect()
+        reconnect_flag = False
+
 
 def on_press(key):
-    global exit_flag, reset_flag
+    global exit_flag, reset_flag, reconnect_flag
 
     if key == keyboard.Key.esc:
         print("ESC pressed → exiting all programs...")
@@ -19,66 +53,112 @@ def on_press(key):
     if key == keyboard.KeyCode.from_char('r'):
         print("Reset (R) pressed → resetting calibration...")
         reset_flag = True
+    if key == keyboard.KeyCode.from_char('c'):
+        print("Reconnect (C) pressed → reopening serial port...")
+        reconnect_flag = True
 
 
 def run_open3d_mode():
-    global reset_flag
-
-    serial_handle = SerialDataHandler(port=SERIAL_PORT, calibration_frames=CALIBRATION_FRAMES)
+    serial_handle = open_handler()
     stl_processor = STLProcessor()
 
     aim_stl_data = stl_processor.load_data("model/processed_stl_data.npy")
-    tac_vis = TactileVisualizer(aim_stl_data, show_axes=False)
+    tac_vis = TactileVisualizer(aim_stl_data, show_axes=False, dtypes=DTYPES)
     tac_vis.create_window()
+    rate_ctrl = RateController(serial_handle, DISPLAY_RATE_HZ, mode=RATE_MODE)
 
     print("Running Open3D tactile visualization... Press ESC to exit.")
 
     while not exit_flag:
-        if reset_flag:
-            print("Resetting Serial + Calibration...")
-            serial_handle.close()
-            serial_handle = SerialDataHandler(port=SERIAL_PORT, calibration_frames=CALIBRATION_FRAMES)
-            reset_flag = False
-        value = serial_handle.read_latest()
+        handle_reset_keys(serial_handle)
+        value = rate_ctrl.read()
         tac_vis.update_visualization(value)
 
     serial_handle.close()
     print("Open3D mode exited.")
 
 
-def run_timeseries_mode():
-    global reset_flag
+def run_pointcloud_mode():
+    serial_handle = open_handler()
+    aim_stl_data = STLProcessor.load_data("model/processed_stl_data.npy")
+    # 点云按 STL 的包围盒对齐到传感器坐标系
+    tac_vis = PointCloudTactileVisualizer("model/ply/point_cloud.ply",
+                                          fit_bounds=aim_stl_data['points'], show_axes=False,
+                                          dtypes=DTYPES)
+    tac_vis.create_window()
+    rate_ctrl = RateController(serial_handle, DISPLAY_RATE_HZ, mode=RATE_MODE)
 
-    serial_handle = SerialDataHandler(port=SERIAL_PORT, calibration_frames=CALIBRATION_FRAMES)
-    time_vis = TimeSeriesVisualizerPG(fs=50)
+    print("Running Open3D point-cloud visualization... Press ESC to exit.")
+
+    while not exit_flag:
+        handle_reset_keys(serial_handle)
+        value = rate_ctrl.read()
+        tac_vis.update_visualization(value)
+
+    serial_handle.close()
+    print("PointCloud mode exited.")
+
+
+def run_multipad_mode():
+    """多个触觉垫 (PAD_PORTS 每个一个串口) 合并在一个 Open3D 场景中批量计算形变"""
+    handlers = [SerialDataHandler(port=port, calibration_frames=CALIBRATION_FRAMES, dtypes=DTYPES)
+                for port in PAD_PORTS]
+    aim_stl_data = STLProcessor.load_data("model/processed_stl_data.npy")
+    tac_vis = MultiPadTactileVisualizer(row_layout(aim_stl_data, len(handlers)), show_axes=False, dtypes=DTYPES)
+    tac_vis.create_window()
+    pacer = Pacer(DISPLAY_RATE_HZ)
+
+    print(f"Running multi-pad visualization with {len(handlers)} pads... Press ESC to exit.")
+
+    while not exit_flag:
+        handle_reset_keys(*handlers)
+        pacer.wait()
+        tac_vis.update_visualization([handler.read_latest() for handler in handlers])
+
+    for handler in handlers:
+        handler.close()
+    print("MultiPad mode exited.")
+
+
+def run_timeseries_mode():
+    serial_handle = open_handler()
+    time_vis = TimeSeriesVisualizerPG(fs=DISPLAY_RATE_HZ, dtypes=DTYPES)
+    rate_ctrl = RateController(serial_handle, DISPLAY_RATE_HZ, mode=RATE_MODE)
 
     print("Running TimeSeries visualizer... Press ESC to exit.")
 
     while not exit_flag:
-        if reset_flag:
-            print("Resetting Serial + Calibration...")
-            serial_handle.close()
-            serial_handle = SerialDataHandler(port=SERIAL_PORT, calibration_frames=CALIBRATION_FRAMES)
-            reset_flag = False
-        value = serial_handle.read_latest()
+        handle_reset_keys(serial_handle)
+        value = rate_ctrl.read()
+        time_vis.set_sample_rate(rate_ctrl.output_rate_hz)
         time_vis.update(value)
 
     serial_handle.close()
     print("TimeSeries mode exited.")
 
 
-def run_readonly_mode():
-    global reset_flag
+def run_pressure_map_mode():
+    serial_handle = open_handler()
+    map_vis = PressureMapVisualizerPG(real_sensor_coords, dtypes=DTYPES)
+    rate_ctrl = RateController(serial_handle, DISPLAY_RATE_HZ, mode=RATE_MODE)
+
+    print("Running 2D pressure map... Press ESC to exit.")
+
+    while not exit_flag:
+        handle_reset_keys(serial_handle)
+        value = rate_ctrl.read()
+        map_vis.update(value)
+
+    serial_handle.close()
+    print("PressureMap mode exited.")
 
-    serial_handle = SerialDataHandler(port=SERIAL_PORT, calibration_frames=CALIBRATION_FRAMES)
+
+def run_readonly_mode():
+    serial_handle = open_handler()
     print("Running ReadOnly mode (print serial data)... Press ESC to exit.")
 
     while not exit_flag:
-        if reset_flag:
-            print("Resetting Serial + Calibration...")
-            serial_handle.close()
-            serial_handle = SerialDataHandler(port=SERIAL_PORT, calibration_frames=CALIBRATION_FRAMES)
-            reset_flag = False
+        handle_reset_keys(serial_handle)
         value = serial_handle.read_latest()
         print(value)
 
@@ -86,13 +166,108 @@ def run_readonly_mode():
     print("ReadOnly mode exited.")
 
 
+def run_server_mode():
+    serial_handle = open_handler()
+    server = FrameServer(serial_handle, host=SERVER_HOST,
+                         tcp_port=SERVER_TCP_PORT, udp_port=SERVER_UDP_PORT)
+    server.start()
+    print("Running frame server... Press ESC to exit.")
+
+    server.serve_forever(should_stop=lambda: exit_flag)
+    serial_handle.close()
+    print("Server mode exited.")
+
+
+PIPELINE_SINKS = {
+    'o': "Open3D 触觉可视化",
+    't': "TimeSeries 时间序列图",
+    'b': "Bars 柱状图",
+    'm': "PressureMap 二维压力图",
+    'g': "PyGame 网格",
+    'r': "Recorder 录制 (S 开始 / Q 保存)",
+    'p': "Printer 打印数据",
+}
+
+
+def run_pipeline_mode(selection):
+    """单个串口读取者，同时驱动多个可视化/录制 sink"""
+    serial_handle = open_handler()
+    pipeline = Pipeline(serial_handle)
+
+    if 'o' in selection:
+        stl_processor = STLProcessor()
+        aim_stl_data = stl_processor.load_data("model/processed_stl_data.npy")
+        tac_vis = TactileVisualizer(aim_stl_data, show_axes=False, dtypes=DTYPES)
+        tac_vis.create_window()
+        pipeline.add_sink('open3d', latest_value(tac_vis.update_visualization))
+    if 't' in selection:
+        time_vis = TimeSeriesVisualizerPG(fs=DISPLAY_RATE_HZ, dtypes=DTYPES)
+
+        def update_timeseries(times_ns, block):
+            time_vis.set_sample_rate(serial_handle.measured_rate_hz)
+            time_vis.update_block(block)
+        pipeline.add_sink('timeseries', update_timeseries, policy='drop_oldest', maxlen=256)
+    if 'b' in selection:
+        bar_vis = BarVisualizerPG()
+        pipeline.add_sink('bars', latest_value(bar_vis.update))
+    if 'm' in selection:
+        map_vis = PressureMapVisualizerPG(real_sensor_coords, dtypes=DTYPES)
+        pipeline.add_sink('pressure_map', latest_value(map_vis.update))
+    if 'g' in selection:
+        from utils.GridVis import FastGridVisualizerPyGame
+        grid_vis = FastGridVisualizerPyGame(1, fps=DISPLAY_RATE_HZ)
+        pipeline.add_sink('grid', latest_value(lambda v: grid_vis.update_grids(v.reshape(1, -1))))
+    if 'r' in selection:
+        from utils.data_logger import DataRecorder
+        rec = DataRecorder(record_rate_hz=100, save_dir="data_logs", dtypes=DTYPES,
+                           save_format=RECORD_FORMAT, metadata=lambda: {
+                               'port': SERIAL_PORT,
+                               'baseline': serial_handle.baseline,
+                               'layout': {'sensor_coords': real_sensor_coords},
+                           })
+        rec.enable_keyboard_control()
+        pipeline.add_sink('recorder', latest_value(rec.update_value), threaded=True)
+    if 'p' in selection:
+        pipeline.add_sink('printer', latest_value(print), threaded=True)
+
+    def should_stop():
+        global reset_flag, reconnect_flag
+        if reset_flag:
+            print("Recalibrating baseline...")
+            pipeline.request_recalibration()
+            reset_flag = False
+        if reconnect_flag:
+            pipeline.request_reconnect()
+            reconnect_flag = False
+        return exit_flag
+
+    print(f"Running pipeline with sinks: {[s.name for s in pipeline.sinks]}... Press ESC to exit.")
+    pipeline.run(should_stop)
+
+    print(pipeline.get_stats())
+    print(serial_handle.get_link_stats())
+    serial_handle.close()
+    print("Pipeline mode exited.")
+
+
 if __name__ == "__main__":
 
     print("请选择模式：")
     print("1 = Open3D 触觉可视化")
     print("2 = TimeSeries 时间序列图")
     print("3 = ReadOnly 只读模式 (打印串口数据)")
-    mode = input("输入 1 / 2 / 3 : ").strip()
+    print("4 = Server 帧服务器 (TCP/UDP 发布数据)")
+    print("5 = Pipeline 组合模式 (一个串口同时可视化/录制)")
+    print("6 = PressureMap 二维压力图 (轻量)")
+    print("7 = PointCloud 点云触觉可视化 (轻量)")
+    print("8 = MultiPad 多触觉垫 Open3D 可视化")
+    mode = input("输入 1 - 8 : ").strip()
+
+    selection = ""
+    if mode == "5":
+        for key, name in PIPELINE_SINKS.items():
+            print(f"  {key} = {name}")
+        selection = input("输入组合 (例如 otr) : ").strip().lower()
 
     # 开启键盘监听
     listener = keyboard.Listener(on_press=on_press)
@@ -104,6 +279,16 @@ if __name__ == "__main__":
         run_timeseries_mode()
     elif mode == "3":
         run_readonly_mode()
+    elif mode == "4":
+        run_server_mode()
+    elif mode == "5":
+        run_pipeline_mode(selection)
+    elif mode == "6":
+        run_pressure_map_mode()
+    elif mode == "7":
+        run_pointcloud_mode()
+    elif mode == "8":
+        run_multipad_mode()
     else:
         print("无效输入，退出程序。")
 
@@ -1,2 +1,12 @@
 SERIAL_PORT = "/dev/ttyACM4"
-CALIBRATION_FRAMES = 50
\ No newline at end of file
+PAD_PORTS = [SERIAL_PORT]   # 多垫模式：每个触觉垫一个串口，按顺序沿 x 轴排列
+CALIBRATION_FRAMES = 50
+DISPLAY_RATE_HZ = 50       # 可视化输出频率
+RATE_MODE = "hold"          # 'hold' / 'decimate' / 'interp'
+SERVER_HOST = "127.0.0.1"   # 帧服务器监听地址, "0.0.0.0" 对局域网开放
+SERVER_TCP_PORT = 9870
+SERVER_UDP_PORT = 9871
+RAW_DTYPE = "float32"       # 串口原始数值类型，固件只输出整数计数时可用 int16 / int32
+VALUE_DTYPE = "float32"     # 校准后数值类型
+GEOMETRY_DTYPE = "float32"  # 顶点/颜色类型
+RECORD_FORMAT = "tta"        # 录制格式: "csv" / "tta" (压缩归档, 见 utils/recording_archive.py)
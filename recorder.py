@@ -1,21 +1,28 @@
-import time
 from utils.data_logger import DataRecorder
 from utils.serialReader import SerialDataHandler
-from config import SERIAL_PORT, CALIBRATION_FRAMES
+from utils.rate_control import RateController
+from utils.dtype_policy import DtypePolicy
+from config import SERIAL_PORT, CALIBRATION_FRAMES, RAW_DTYPE, VALUE_DTYPE, RECORD_FORMAT
 
 READ_RATE_HZ = 500        
 RECORD_RATE_HZ = 100      
 SAVE_DIR = "data_logs"
+DTYPES = DtypePolicy(raw=RAW_DTYPE, value=VALUE_DTYPE)
 
 
 serial_handle = SerialDataHandler(
     port=SERIAL_PORT,
-    calibration_frames=CALIBRATION_FRAMES
+    calibration_frames=CALIBRATION_FRAMES,
+    dtypes=DTYPES
 )
 
 rec = DataRecorder(
     record_rate_hz=RECORD_RATE_HZ,
-    save_dir=SAVE_DIR
+    save_dir=SAVE_DIR,
+    dtypes=DTYPES,
+    save_format=RECORD_FORMAT,
+    metadata=lambda: {'port': SERIAL_PORT, 'baseline': serial_handle.baseline,
+                      'read_rate_hz': READ_RATE_HZ}
 )
 
 rec.enable_keyboard_control()
@@ -23,9 +30,8 @@ rec.enable_keyboard_control()
 print("Press [S] to start recording")
 print("Press [Q] to stop & save")
 
-read_interval = 1.0 / READ_RATE_HZ
+rate_ctrl = RateController(serial_handle, READ_RATE_HZ, mode="hold")
 
 while True:
-    value = serial_handle.read_latest()
+    value = rate_ctrl.read()
     rec.update_value(value)
-    time.sleep(read_interval)
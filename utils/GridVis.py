@@ -1,4 +1,5 @@
 import pygame
+import time
 import sys
 import numpy as np
 class GridVisualizerPyGame:
@@ -142,3 +143,128 @@ class GridVisualizerPyGame:
         """关闭可视化"""
         pygame.quit()
         sys.exit()
+
+
+class FastGridVisualizerPyGame(GridVisualizerPyGame):
+    def __init__(self, n, cell_size=60, spacing=15, max_cols=8, fps=60, vmax=200.0):
+        """
+        快速网格可视化：静态层(标题/边框)只绘制一次；数值经查找表向量化映射为颜色等级，
+        每个等级的圆点预先用 surfarray 生成缓存 surface；每帧只 blit 颜色等级变化的格子，
+        并用 display.update(dirty_rects) 局部刷新
+        :param n: 网格数量
+        :param cell_size: 单个格子尺寸(像素)
+        :param spacing: 网格间距(像素)
+        :param max_cols: 每行最多网格数，超出换行
+        :param fps: 最高刷新率，两次刷新之间到达的数据只保留最新一帧；None 不限制
+        :param vmax: 颜色映射的满量程
+        """
+        self.n = n
+        self.data = np.zeros((n, 8), dtype=int)
+        self.fps = fps
+        self.vmax = vmax
+        self.last_render = 0.0
+
+        pygame.init()
+
+        self.colors = {
+            'background': (240, 240, 240),
+            'grid_border': (200, 200, 200),
+            'text': (50, 50, 50)
+        }
+        self.positions = [(0, 0), (2, 0), (0, 1), (1, 1), (2, 1), (0, 2), (1, 2), (2, 2)]
+        self.font = pygame.font.SysFont(None, 24)
+        self.title_font = pygame.font.SysFont(None, 28)
+
+        # 布局 (多行)
+        grid_width = 3 * cell_size
+        title_h = 30
+        cols = min(n, max_cols)
+        rows = (n + cols - 1) // cols
+        self.window_size = (cols * (grid_width + spacing) + spacing,
+                            rows * (grid_width + spacing + title_h) + spacing)
+        self.screen = pygame.display.set_mode(self.window_size)
+        pygame.display.set_caption("Real-time Grid Visualization")
+
+        self.grid_rects = []
+        for i in range(n):
+            x = spacing + (i % cols) * (grid_width + spacing)
+            y = spacing + title_h + (i // cols) * (grid_width + spacing + title_h)
+            self.grid_rects.append(pygame.Rect(x, y, grid_width, grid_width))
+
+        # 每个格子的圆点外接矩形 (n*8 个)，即脏矩形
+        radius = cell_size // 3
+        size = 2 * radius + 1
+        self.cell_rects = []
+        for rect in self.grid_rects:
+            for gx, gy in self.positions:
+                cx = rect.left + gx * cell_size + cell_size // 2
+                cy = rect.top + gy * cell_size + cell_size // 2
+                self.cell_rects.append(pygame.Rect(cx - radius, cy - radius, size, size))
+
+        self.lut = self._build_lut()
+        self.sprites = self._build_sprites(radius)
+        self.last_index = np.full(n * 8, -1)
+
+        self._draw_static_layer()
+
+    def _build_lut(self):
+        """颜色查找表：索引 0 对应数值 0(白色)，1..256 对应 (0, vmax] 的 256 个等级"""
+        lut = np.empty((257, 3), dtype=np.uint8)
+        lut[0] = (255, 255, 255)
+        for i in range(256):
+            # value_to_color 以 200 为满量程
+            lut[i + 1] = np.clip(self.value_to_color((i + 1) / 256.0 * 200.0), 0, 255)
+        return lut
+
+    def _build_sprites(self, radius):
+        """为每个颜色等级预生成圆点 surface"""
+        xx, yy = np.mgrid[-radius:radius + 1, -radius:radius + 1]
+        disk = (xx * xx + yy * yy <= radius * radius)[:, :, None]
+        background = np.array(self.colors['background'], dtype=np.uint8)
+        sprites = []
+        for color in self.lut:
+            pixels = np.where(disk, color, background)
+            sprites.append(pygame.surfarray.make_surface(pixels).convert())
+        return sprites
+
+    def _value_index(self, values):
+        """向量化地把数值映射为颜色等级"""
+        values = np.asarray(values, dtype=np.float64)
+        idx = np.clip(np.ceil(values / self.vmax * 256), 1, 256).astype(np.int64)
+        idx[values == 0] = 0
+        return idx
+
+    def _draw_static_layer(self):
+        """背景、标题和边框只绘制一次"""
+        self.screen.fill(self.colors['background'])
+        for grid_idx, grid_rect in enumerate(self.grid_rects):
+            title = self.title_font.render(f'Grid-{grid_idx+1}', True, self.colors['text'])
+            self.screen.blit(title, (grid_rect.centerx - title.get_width()//2,
+                                     grid_rect.top - 28))
+            pygame.draw.rect(self.screen, self.colors['grid_border'], grid_rect, 2)
+        pygame.display.flip()
+
+    def update_grids(self, new_data):
+        """更新网格数据，只重绘颜色等级变化的格子"""
+        self.data = new_data
+
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                pygame.quit()
+                sys.exit()
+
+        now = time.monotonic()
+        if self.fps and now - self.last_render < 1.0 / self.fps:
+            return
+        self.last_render = now
+
+        index = self._value_index(np.reshape(new_data, -1))
+        changed = np.nonzero(index != self.last_index)[0].tolist()
+        if not changed:
+            return
+        self.last_index = index
+
+        dirty_rects = [self.cell_rects[c] for c in changed]
+        self.screen.blits([(self.sprites[i], rect) for i, rect in zip(index[changed].tolist(), dirty_rects)],
+                          doreturn=False)
+        pygame.display.update(dirty_rects)
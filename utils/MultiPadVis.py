@@ -0,0 +1,230 @@
+import time
+
+import numpy as np
+import open3d as o3d
+from scipy.sparse import block_diag
+
+from utils.RbfVis import deformation_colors, TactileVisualizer, STLProcessor
+from utils.rbf_operator import rbf_operator
+from utils.dtype_policy import DEFAULT_DTYPES
+
+
+def make_pad(stl_data, sensor_coords=None, offset=(0, 0, 0), rotation=None, scale_factor=1.0):
+    """
+    描述一个触觉垫在场景中的位置
+
+    Parameters:
+        stl_data (dict): STLProcessor.load_data 的结果 (points / triangles / sensor_points)
+        sensor_coords: (N, 3) 传感器坐标 (垫自身坐标系)，None 时使用 stl_data['sensor_points']
+        offset: 垫在场景中的平移
+        rotation: 3x3 旋转矩阵 (垫坐标系 -> 场景)，None 为不旋转
+        scale_factor (float): 形变缩放
+    """
+    return {
+        'points': np.asarray(stl_data['points'], dtype=np.float64),
+        'triangles': np.asarray(stl_data['triangles']),
+        'sensor_coords': np.asarray(stl_data['sensor_points'] if sensor_coords is None else sensor_coords,
+                                    dtype=np.float64),
+        'offset': np.asarray(offset, dtype=np.float64),
+        'rotation': np.eye(3) if rotation is None else np.asarray(rotation, dtype=np.float64),
+        'scale_factor': scale_factor,
+    }
+
+
+def row_layout(stl_data, n_pads, gap=10.0):
+    """把 n_pads 个相同的垫沿 x 轴并排摆放"""
+    points = np.asarray(stl_data['points'])
+    width = np.ptp(points[:, 0]) + gap
+    return [make_pad(stl_data, offset=(i * width, 0, 0)) for i in range(n_pads)]
+
+
+class MultiPadDeformationEngine:
+    def __init__(self, pads, function='gaussian', dtypes=DEFAULT_DTYPES, lut_size=1024, lut_max=54.0):
+        """
+        多个触觉垫的批量形变计算
+
+        加载时为每个垫预计算 RBF 插值算子 (顶点 x 传感器)，拼成一个分块对角稀疏矩阵，
+        每帧对所有垫只做一次稀疏矩阵乘法 + 一次逐顶点运算，与垫的数量无关地只有常数次 Python 调用。
+        每个垫的结果与 TactileVisualizer.compute_deformation 一致 (颜色经查找表量化)
+
+        Parameters:
+            pads (list): make_pad 返回的垫描述
+            function (str): RBF 核函数，与 scipy Rbf 相同
+            dtypes: DtypePolicy，顶点/权重/颜色使用 geometry 类型
+            lut_size, lut_max: 颜色查找表的大小与上限 (形变超过 lut_max 后颜色不变)
+        """
+        self.pads = pads
+        self.dtypes = dtypes
+        geometry = dtypes.geometry
+
+        self.sensor_counts = np.array([len(p['sensor_coords']) for p in pads])
+        self.vertex_counts = np.array([len(p['points']) for p in pads])
+        self.sensor_slices = np.concatenate([[0], np.cumsum(self.sensor_counts)])
+        self.vertex_slices = np.concatenate([[0], np.cumsum(self.vertex_counts)])
+
+        operators, coeffs, scales, bases, axes, triangles = [], [], [], [], [], []
+        for pad, v0 in zip(pads, self.vertex_slices[:-1]):
+            points = pad['points']
+            operators.append(rbf_operator(pad['sensor_coords'][:, [0, 2]], points[:, [0, 2]],
+                                          function=function, dtype=geometry))
+            # 与 TactileVisualizer 相同：距离Y=0平面越远形变越大 (每个垫单独归一化)
+            y = np.abs(points[:, 1])
+            coeffs.append(((y - 0.0) / (np.max(y) - np.min(y))) ** 2)
+            scales.append(np.full(len(points), 0.4 * pad['scale_factor']))
+            # 垫坐标系 -> 场景坐标系；形变沿垫自身的 -Y 方向
+            bases.append(points @ pad['rotation'].T + pad['offset'])
+            axes.append(np.broadcast_to(pad['rotation'][:, 1], points.shape))
+            triangles.append(pad['triangles'] + v0)
+
+        # 分块对角：第 p 个垫的顶点只依赖第 p 个垫的传感器
+        self.weights = block_diag(operators, format='csr').astype(geometry)
+        self.gain = (np.concatenate(coeffs) * np.concatenate(scales)).astype(geometry)
+        self.base_points = np.concatenate(bases).astype(geometry)
+        self.axes = np.concatenate(axes).astype(geometry)
+        self.triangles = np.concatenate(triangles)
+        self.sensor_points = np.concatenate([p['sensor_coords'] @ p['rotation'].T + p['offset'] for p in pads])
+
+        self.color_lut = deformation_colors(np.linspace(0.0, lut_max, lut_size, dtype=geometry))
+        self.lut_scale = (lut_size - 1) / lut_max
+        self.points = self.base_points.copy()  # 每帧复用的顶点缓存
+
+    @property
+    def num_sensors(self):
+        return int(self.sensor_slices[-1])
+
+    def split_values(self, values):
+        """把拼接后的传感器值拆成每个垫的一段"""
+        return np.split(values, self.sensor_slices[1:-1])
+
+    def compute_deformation(self, calibrated_values):
+        """
+        :param calibrated_values: (num_sensors,) 所有垫校准后的传感器值，按垫的顺序拼接
+        :return: (points[V, 3], colors[V, 3], deformation[V])，V 为所有垫的顶点总数
+        """
+        values = np.asarray(calibrated_values, dtype=self.dtypes.geometry)
+        deformation = np.maximum(self.weights @ values, 0)
+        deformation *= self.gain
+        np.subtract(self.base_points, deformation[:, None] * self.axes, out=self.points)
+        index = np.minimum(deformation * self.lut_scale, len(self.color_lut) - 1).astype(np.intp)
+        return self.points, self.color_lut[index], deformation
+
+    def compute_block(self, calibrated_block):
+        """离线批量：(n_frames, num_sensors) -> 每帧每个顶点的形变量 (n_frames, V)"""
+        block = np.asarray(calibrated_block, dtype=self.dtypes.geometry)
+        return np.maximum(self.weights @ block.T, 0).T * self.gain
+
+
+class MultiPadTactileVisualizer:
+    def __init__(self, pads, show_axes=True, calibration_num=10, dtypes=DEFAULT_DTYPES):
+        """
+        多个触觉垫合并为一个 Open3D 网格显示，每帧只更新一个几何体
+
+        Parameters:
+            pads (list): make_pad 返回的垫描述
+            calibration_num (int): 可视化端的校准帧数，与 TactileVisualizer 一致
+        """
+        self.engine = MultiPadDeformationEngine(pads, dtypes=dtypes)
+        self.show_axes = show_axes
+        self.vis = None
+        self.mesh = None
+        self.running = False
+
+        # 校准相关
+        self.calibration_num = calibration_num
+        self.calibration_count = 0
+        self.calibration_values = []
+        self.baseline_values = None
+        self.calibrated = False
+
+    def create_window(self):
+        self.vis = o3d.visualization.Visualizer()
+        self.vis.create_window()
+        render_opt = self.vis.get_render_option()
+        render_opt.background_color = np.array([0.0, 0.0, 0.0])
+
+        if self.show_axes:
+            self.vis.add_geometry(o3d.geometry.TriangleMesh.create_coordinate_frame(size=50, origin=[0, 0, 0]))
+
+        self.mesh = o3d.geometry.TriangleMesh()
+        self.mesh.vertices = o3d.utility.Vector3dVector(self.engine.base_points)
+        self.mesh.triangles = o3d.utility.Vector3iVector(self.engine.triangles)
+        self.mesh.compute_vertex_normals()
+        self.mesh.paint_uniform_color([0.7, 0.7, 0.7])
+
+        sensors = o3d.geometry.PointCloud()
+        sensors.points = o3d.utility.Vector3dVector(self.engine.sensor_points)
+        sensors.paint_uniform_color([1, 0, 0])
+
+        self.vis.add_geometry(self.mesh)
+        self.vis.add_geometry(sensors)
+
+        view_control = self.vis.get_view_control()
+        view_control.set_front([0, 0, -1])
+        view_control.set_up([0, 1, 0])
+        self.running = True
+
+    def update_visualization(self, sensor_values):
+        """
+        :param sensor_values: 所有垫的传感器值，(num_sensors,) 或每个垫一个数组的列表
+        """
+        if not self.running:
+            return
+        if isinstance(sensor_values, (list, tuple)):
+            sensor_values = np.concatenate(sensor_values)
+        if not self.calibrated:
+            self.calibration_values.append(np.array(sensor_values))
+            self.calibration_count += 1
+            if self.calibration_count >= self.calibration_num:
+                self.baseline_values = np.mean(self.calibration_values, axis=0)
+                self.calibrated = True
+                print("Calibration success! Baseline values:", self.baseline_values)
+            return
+
+        points, colors, _ = self.engine.compute_deformation(sensor_values - self.baseline_values)
+        self.mesh.vertices = o3d.utility.Vector3dVector(points)
+        self.mesh.vertex_colors = o3d.utility.Vector3dVector(colors)
+        self.mesh.compute_vertex_normals()
+
+        self.vis.update_geometry(self.mesh)
+        self.vis.poll_events()
+        self.vis.update_renderer()
+
+    def close_window(self):
+        if self.running:
+            self.vis.destroy_window()
+            self.running = False
+
+
+def benchmarkMultiPad(n_pads=(1, 4, 8), n_frames=100, stl_data_path="model/processed_stl_data.npy"):
+    """比较每个垫一个 TactileVisualizer (逐帧 Rbf) 与批量引擎每帧的CPU耗时，不含渲染"""
+    stl_data = STLProcessor.load_data(stl_data_path)
+    for n in n_pads:
+        pads = row_layout(stl_data, n)
+        engine = MultiPadDeformationEngine(pads)
+        per_pad = [TactileVisualizer(stl_data) for _ in range(n)]
+        frames = np.random.uniform(0, 150, (n_frames, engine.num_sensors))
+
+        # 结果一致性：引擎中每个垫的形变与单独计算相同
+        points, _, _ = engine.compute_deformation(frames[0])
+        for p, (vis, values) in enumerate(zip(per_pad, engine.split_values(frames[0]))):
+            ref, _ = vis.compute_deformation(values)
+            v0, v1 = engine.vertex_slices[p], engine.vertex_slices[p + 1]
+            assert np.allclose(points[v0:v1] - pads[p]['offset'], ref, atol=1e-3)
+
+        t0 = time.perf_counter()
+        for values in frames:
+            for vis, pad_values in zip(per_pad, engine.split_values(values)):
+                vis.compute_deformation(pad_values)
+        loop_ms = (time.perf_counter() - t0) / n_frames * 1e3
+
+        t0 = time.perf_counter()
+        for values in frames:
+            engine.compute_deformation(values)
+        batch_ms = (time.perf_counter() - t0) / n_frames * 1e3
+
+        print(f"{n} pads ({int(engine.vertex_slices[-1])} vertices): per-pad Rbf {loop_ms:.3f} ms/frame, "
+              f"batched {batch_ms:.3f} ms/frame ({loop_ms / batch_ms:.0f}x)")
+
+
+if __name__ == '__main__':
+    benchmarkMultiPad()
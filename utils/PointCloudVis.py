@@ -0,0 +1,186 @@
+import time
+
+import numpy as np
+import open3d as o3d
+from scipy.sparse import csr_matrix
+from scipy.spatial import cKDTree
+
+from utils.RbfVis import real_sensor_coords, deformation_colors, TactileVisualizer, STLProcessor
+from utils.dtype_policy import DEFAULT_DTYPES
+
+
+class PointCloudTactileVisualizer:
+    def __init__(self, ply_path="model/ply/point_cloud.ply", sensor_coords=real_sensor_coords,
+                 fit_bounds=None, k=4, power=2.0, scale_factor=1.0, show_axes=True,
+                 calibration_num=10, dtypes=DEFAULT_DTYPES):
+        """
+        点云触觉可视化：加载时用 KD-tree 找到每个点最近的 k 个传感器并保存反距离权重，
+        每帧只做一次稀疏加权求和 + 颜色映射，无需重新计算三角面法线
+
+        Parameters:
+            ply_path (str): 点云文件
+            sensor_coords: (N, 3) 传感器坐标
+            fit_bounds: 可选 (M, 3) 参考点 (如 STL 顶点)。点云与传感器坐标单位/尺寸不一致时，
+                        按轴把点云包围盒线性映射到参考点的包围盒
+            k (int): 每个点使用的最近传感器数
+            power (float): 反距离权重的幂次
+            scale_factor (float): 形变缩放，与 TactileVisualizer 一致
+            calibration_num (int): 可视化端的校准帧数，与 TactileVisualizer 一致
+            dtypes: DtypePolicy，点坐标/权重/颜色使用 geometry 类型
+        """
+        self.dtypes = dtypes
+        self.scale_factor = scale_factor
+        self.show_axes = show_axes
+        self.vis = None
+        self.pcd = None
+        self.running = False
+
+        cloud = o3d.io.read_point_cloud(ply_path)
+        if not cloud.has_points():
+            raise ValueError("PLY file error")
+        points = np.asarray(cloud.points, dtype=np.float64)
+        if fit_bounds is not None:
+            points = self._fit_to_bounds(points, np.asarray(fit_bounds, dtype=np.float64))
+        self.original_points = points.astype(dtypes.geometry)
+        self.points = points.copy()  # 每帧复用的顶点缓存
+        self.sensor_points_coords = np.asarray(sensor_coords, dtype=np.float64)
+
+        self._init_distance_coefficients()
+        self._init_neighbor_weights(k, power)
+
+        # 颜色查找表：形变 54 以上颜色不再变化
+        self.lut_max = 54.0
+        self.color_lut = deformation_colors(np.linspace(0.0, self.lut_max, 1024, dtype=dtypes.geometry))
+        self.lut_scale = (len(self.color_lut) - 1) / self.lut_max
+
+        # 校准相关
+        self.calibration_num = calibration_num
+        self.calibration_count = 0
+        self.calibration_values = []
+        self.baseline_values = None
+        self.calibrated = False
+
+    @staticmethod
+    def _fit_to_bounds(points, reference):
+        lo, hi = points.min(axis=0), points.max(axis=0)
+        ref_lo, ref_hi = reference.min(axis=0), reference.max(axis=0)
+        span = np.where(hi > lo, hi - lo, 1.0)
+        return ref_lo + (points - lo) / span * (ref_hi - ref_lo)
+
+    def _init_distance_coefficients(self):
+        """与 TactileVisualizer 相同：距离Y=0平面越远形变越大"""
+        y_coords = np.abs(self.original_points[:, 1])
+        self.distance_coeffs = ((y_coords - 0.0) / (np.max(y_coords) - np.min(y_coords))) ** 2
+        self.distance_coeffs = self.distance_coeffs.astype(self.dtypes.geometry)
+
+    def _init_neighbor_weights(self, k, power):
+        """预计算每个点的 k 近邻传感器反距离权重，组成稀疏矩阵 (P x N)"""
+        sensor_xz = self.sensor_points_coords[:, [0, 2]]
+        k = min(k, len(sensor_xz))
+        tree = cKDTree(sensor_xz)
+        dist, idx = tree.query(self.original_points[:, [0, 2]], k=k)
+        dist = dist.reshape(len(self.original_points), k)
+        idx = idx.reshape(len(self.original_points), k)
+
+        w = 1.0 / np.maximum(dist, 1e-6) ** power
+        w /= w.sum(axis=1, keepdims=True)
+        n_points = len(self.original_points)
+        self.weights = csr_matrix((w.ravel().astype(self.dtypes.geometry), idx.ravel(),
+                                   np.arange(0, n_points * k + 1, k)),
+                                  shape=(n_points, len(sensor_xz)))
+
+    def compute_deformation(self, calibrated_values):
+        """根据校准后的传感器值计算形变后的点与颜色"""
+        y_offsets = np.maximum(self.weights @ calibrated_values.astype(self.dtypes.geometry, copy=False), 0)
+        deformation = 0.4 * y_offsets * self.distance_coeffs * self.scale_factor
+        self.points[:, 1] = self.original_points[:, 1] - deformation
+        index = np.minimum(deformation * self.lut_scale, len(self.color_lut) - 1).astype(np.intp)
+        return self.points, self.color_lut[index]
+
+    def create_window(self):
+        self.vis = o3d.visualization.Visualizer()
+        self.vis.create_window()
+        render_opt = self.vis.get_render_option()
+        render_opt.background_color = np.array([0.0, 0.0, 0.0])
+        render_opt.point_size = 3.0
+
+        if self.show_axes:
+            self.vis.add_geometry(o3d.geometry.TriangleMesh.create_coordinate_frame(size=50, origin=[0, 0, 0]))
+
+        self.pcd = o3d.geometry.PointCloud()
+        self.pcd.points = o3d.utility.Vector3dVector(self.original_points)
+        self.pcd.paint_uniform_color([0.9, 0.9, 0.9])
+
+        sensors = o3d.geometry.PointCloud()
+        sensors.points = o3d.utility.Vector3dVector(self.sensor_points_coords)
+        sensors.paint_uniform_color([1, 0, 0])
+
+        self.vis.add_geometry(self.pcd)
+        self.vis.add_geometry(sensors)
+
+        view_control = self.vis.get_view_control()
+        view_control.set_front([0, 0, -1])
+        view_control.set_up([0, 1, 0])
+        self.running = True
+
+    def update_visualization(self, sensor_values):
+        if not self.running:
+            return
+        if not self.calibrated:
+            self.calibration_values.append(sensor_values.copy())
+            self.calibration_count += 1
+            if self.calibration_count >= self.calibration_num:
+                self.baseline_values = np.mean(self.calibration_values, axis=0)
+                self.calibrated = True
+                print("Calibration success! Baseline values:", self.baseline_values)
+            return
+
+        points, colors = self.compute_deformation(sensor_values - self.baseline_values)
+        self.pcd.points = o3d.utility.Vector3dVector(points)
+        self.pcd.colors = o3d.utility.Vector3dVector(colors)
+
+        self.vis.update_geometry(self.pcd)
+        self.vis.poll_events()
+        self.vis.update_renderer()
+
+    def close_window(self):
+        if self.running:
+            self.vis.destroy_window()
+            self.running = False
+
+
+def benchmarkPointCloudVsMesh(n_frames=200, stl_data_path="model/processed_stl_data.npy"):
+    """比较网格路径(Rbf + 法线重算)与点云路径(稀疏加权和)每帧的CPU耗时，不含渲染"""
+    stl_data = STLProcessor.load_data(stl_data_path)
+    mesh_vis = TactileVisualizer(stl_data)
+    cloud_vis = PointCloudTactileVisualizer(fit_bounds=stl_data['points'])
+
+    mesh = o3d.geometry.TriangleMesh()
+    mesh.vertices = o3d.utility.Vector3dVector(stl_data['points'])
+    mesh.triangles = o3d.utility.Vector3iVector(stl_data['triangles'])
+    pcd = o3d.geometry.PointCloud()
+
+    frames = np.random.uniform(0, 150, (n_frames, len(real_sensor_coords)))
+
+    t0 = time.perf_counter()
+    for values in frames:
+        points, colors = mesh_vis.compute_deformation(values)
+        mesh.vertices = o3d.utility.Vector3dVector(points)
+        mesh.vertex_colors = o3d.utility.Vector3dVector(colors)
+        mesh.compute_vertex_normals()
+    mesh_ms = (time.perf_counter() - t0) / n_frames * 1e3
+
+    t0 = time.perf_counter()
+    for values in frames:
+        points, colors = cloud_vis.compute_deformation(values)
+        pcd.points = o3d.utility.Vector3dVector(points)
+        pcd.colors = o3d.utility.Vector3dVector(colors)
+    cloud_ms = (time.perf_counter() - t0) / n_frames * 1e3
+
+    print(f"mesh  ({len(stl_data['points'])} vertices): {mesh_ms:.3f} ms/frame")
+    print(f"cloud ({len(cloud_vis.original_points)} points): {cloud_ms:.3f} ms/frame")
+    print(f"speedup per vertex: {mesh_ms / len(stl_data['points']) / (cloud_ms / len(cloud_vis.original_points)):.1f}x")
+
+
+if __name__ == '__main__':
+    benchmarkPointCloudVsMesh()
@@ -4,9 +4,32 @@ import time
 import math
 from scipy.interpolate import Rbf
 from collections import defaultdict
+from utils.dtype_policy import DEFAULT_DTYPES
 
 real_sensor_coords = np.array([[-10, 0, 6], [-10, 0, 0], [-10, 0, -6], [0, 0, 6], [0, 0, 0], [0, 0, -6], [15, 0, 3], [15, 0, -3], ])
 
+
+def deformation_colors(deformation):
+    """形变量 -> 顶点颜色 (向量化)，分段与原逐点映射一致"""
+    d = np.asarray(deformation)[:, None]
+    r_green = (d - 2) / 5
+    r_mix = (d - 8) / 4
+    r_red = np.minimum((d - 12) / 42, 1)  # 限制在50达到最深
+    one = np.ones_like(d)
+    return np.select(
+        [d <= 1, d <= 6, d <= 10],
+        [
+            # 0-2: 浅灰色 (0.9,0.9,0.9)
+            np.hstack([0.9 * one, 0.9 * one, 0.9 * one]),
+            # 2-8: 浅绿到中绿 (0.6,1,0.6) -> (0.2,0.8,0.2)
+            np.hstack([0.6 - 0.4*r_green, 1 - 0.2*r_green, 0.6 - 0.4*r_green]),
+            # 8-12: 绿色到红色过渡 (0.2,0.8,0.2) -> (0.8,0.2,0.2)
+            np.hstack([0.2 + 0.6*r_mix, 0.8 - 0.6*r_mix, 0.2 * one]),
+        ],
+        # 12+: 红色到深红 (0.8,0.2,0.2) -> (0.4,0,0)
+        np.hstack([0.8 - 0.4*r_red, np.maximum(0.2 - 0.2*r_red, 0), 0.2 - 0.2*r_red]),
+    )
+
 # == 加载stl文件并存储用于可视化的信息 == #
 class STLProcessor:
     def __init__(self):
@@ -62,8 +85,10 @@ class STLProcessor:
 
 
 class TactileVisualizer:
-    def __init__(self, stl_data, scale_factor=1.0, grid_size=50, show_axes=True, calibration_num=10):
+    def __init__(self, stl_data, scale_factor=1.0, grid_size=50, show_axes=True, calibration_num=10,
+                 dtypes=DEFAULT_DTYPES):
         self.scale_factor = scale_factor
+        self.dtypes = dtypes
         self.stl_data = stl_data
         self.vis = o3d.visualization.Visualizer()
 
@@ -87,13 +112,17 @@ class TactileVisualizer:
         self.baseline_values = None  # 校准后的基准值
         self.calibrated = False  # 是否已完成校准
 
+        # 存储原始顶点位置
+        self.original_points = np.asarray(self.stl_data['points'], dtype=dtypes.geometry).copy()
+        # 初始化形变系数(点初始化时距离y轴的距离，距离y轴0点越远(越高)形变越大)
+        self._init_distance_coefficients()
 
     def _init_distance_coefficients(self):
         """计算每个顶点到Y=0平面的距离系数(归一化到[0,1])"""
         y_coords = np.abs(self.original_points[:, 1])  # 取Y坐标绝对值
         self.distance_coeffs = (y_coords - 0.0) / (np.max(y_coords) - np.min(y_coords))
         # 可选：对系数做非线性变换（例如平方增强差异）
-        self.distance_coeffs = self.distance_coeffs ** 2     
+        self.distance_coeffs = self.distance_coeffs ** 2
 
     def create_window(self):
         self.vis.create_window()
@@ -129,11 +158,6 @@ class TactileVisualizer:
         self.mesh.compute_vertex_normals()
         self.mesh.paint_uniform_color([0.7, 0.7, 0.7])
 
-        # 存储原始顶点位置
-        self.original_points = np.copy(self.stl_data['points'])
-        # 初始化形变系数(点初始化时距离y轴的距离，距离y轴0点越远(越高)形变越大)
-        self._init_distance_coefficients()
-
         # 添加传感器点可视化 (红色显示)
         self.sensor_points = o3d.geometry.PointCloud()
         self.sensor_points.points = o3d.utility.Vector3dVector(self.sensor_points_coords)
@@ -167,7 +191,20 @@ class TactileVisualizer:
         # 校准完成后，减去基准值
         calibrated_values = sensor_values - self.baseline_values
         # print(calibrated_values)
+        new_points, colors = self.compute_deformation(calibrated_values)
+
+        # 更新网格
+        self.mesh.vertices = o3d.utility.Vector3dVector(new_points)
+        self.mesh.vertex_colors = o3d.utility.Vector3dVector(colors)
+        self.mesh.compute_vertex_normals()
 
+        # 刷新可视化
+        self.vis.update_geometry(self.mesh)
+        self.vis.poll_events()
+        self.vis.update_renderer()
+
+    def compute_deformation(self, calibrated_values):
+        """根据校准后的传感器值计算形变后的顶点与颜色"""
         new_points = np.copy(self.original_points)
 
         # RBF插值计算形变量（保持原有逻辑）
@@ -175,40 +212,14 @@ class TactileVisualizer:
                 self.sensor_points_coords[:, 2],
                 calibrated_values,  # 使用校准后的值
                 function='gaussian')
-        y_offsets = np.maximum(rbf(new_points[:, 0], new_points[:, 2]), 0)
+        y_offsets = np.maximum(rbf(new_points[:, 0], new_points[:, 2]), 0).astype(self.dtypes.geometry)
         deformation = 0.4 * y_offsets * self.distance_coeffs * self.scale_factor
         new_points[:, 1] -= deformation
 
-        # 初始化颜色数组
-        colors = np.ones((len(new_points), 3)) * 0.9  # 默认浅灰色
-
-        # 优化的颜色映射
-        for i, def_val in enumerate(deformation):
-            if def_val <= 1:
-                # 0-2: 浅灰色 (0.9,0.9,0.9)
-                colors[i] = [0.9, 0.9, 0.9]
-            elif def_val <= 6:
-                # 2-8: 浅绿到中绿 (0.6,1,0.6) -> (0.2,0.8,0.2)
-                ratio = (def_val - 2) / 5
-                colors[i] = [0.6 - 0.4*ratio, 1 - 0.2*ratio, 0.6 - 0.4*ratio]
-            elif def_val <= 10:
-                # 8-12: 绿色到红色过渡 (0.2,0.8,0.2) -> (0.8,0.2,0.2)
-                ratio = (def_val - 8) / 4
-                colors[i] = [0.2 + 0.6*ratio, 0.8 - 0.6*ratio, 0.2]
-            else:
-                # 12+: 红色到深红 (0.8,0.2,0.2) -> (0.4,0,0)
-                ratio = min((def_val - 12) / 42, 1)  # 限制在50达到最深
-                colors[i] = [0.8 - 0.4*ratio, max(0.2 - 0.2*ratio, 0), 0.2 - 0.2*ratio]
-
-        # 更新网格
-        self.mesh.vertices = o3d.utility.Vector3dVector(new_points)
-        self.mesh.vertex_colors = o3d.utility.Vector3dVector(colors)
-        self.mesh.compute_vertex_normals()
+        # 颜色映射
+        colors = deformation_colors(deformation)
 
-        # 刷新可视化
-        self.vis.update_geometry(self.mesh)
-        self.vis.poll_events()
-        self.vis.update_renderer()
+        return new_points, colors
 
     def close_window(self):
         if self.running:
@@ -0,0 +1,176 @@
+from itertools import compress
+
+import numpy as np
+
+# 合法字符：数字、符号、小数点、指数、空白
+_ALLOWED = np.zeros(256, dtype=bool)
+_ALLOWED[np.frombuffer(b'0123456789+-.eE \t\r\n', dtype=np.uint8)] = True
+# 分隔符必须与 bytes.split() 一致 (含 \x0b \x0c)，否则乱码行的 token 计数会与切分结果错位
+_WHITESPACE = np.zeros(256, dtype=bool)
+_WHITESPACE[np.frombuffer(b' \t\r\n\x0b\x0c', dtype=np.uint8)] = True
+_FLOAT_CHARS = np.zeros(256, dtype=bool)
+_FLOAT_CHARS[np.frombuffer(b'.eE', dtype=np.uint8)] = True
+_POW10 = 10.0 ** np.arange(16)  # float64 可精确表示 15 位以内的整数
+
+
+def take_complete_lines(buffer):
+    """
+    一次性取出缓冲区中所有完整行 (只做一次切片和删除，避免逐行 del 的二次复杂度)
+
+    :param buffer: bytearray，剩余的半行保留在其中
+    :return: bytes (以 b'\\n' 结尾)，没有完整行时返回 None
+    """
+    end = buffer.rfind(b'\n')
+    if end < 0:
+        return None
+    chunk = bytes(buffer[:end + 1])
+    del buffer[:end + 1]
+    return chunk
+
+
+def _line_bounds(arr):
+    """每行的起始下标与结尾 b'\\n' 的下标"""
+    line_ends = np.flatnonzero(arr == 10)
+    line_starts = np.empty(len(line_ends), dtype=np.intp)
+    if len(line_ends):
+        line_starts[0] = 0
+        line_starts[1:] = line_ends[:-1] + 1
+    return line_starts, line_ends
+
+
+def match_lines(chunk, marker):
+    """
+    标记内容等于 marker 的行 (忽略行尾 b'\\r')，用于识别帧分隔行、空行等
+
+    :param chunk: bytes，若干以 b'\\n' 结尾的完整行
+    :param marker: bytes，b'' 表示空行
+    :return: bool 数组 (n_lines,)
+    """
+    arr = np.frombuffer(chunk, dtype=np.uint8)
+    line_starts, line_ends = _line_bounds(arr)
+    lengths = line_ends - line_starts
+    # 去掉行尾的 b'\r'
+    has_cr = np.zeros(len(line_ends), dtype=bool)
+    nonempty = lengths > 0
+    has_cr[nonempty] = arr[line_ends[nonempty] - 1] == 13
+    lengths = lengths - has_cr
+    hit = lengths == len(marker)
+    if len(marker) and hit.any():
+        candidates = np.flatnonzero(hit)
+        content = arr[line_starts[candidates, None] + np.arange(len(marker))]
+        hit[candidates] = (content == np.frombuffer(marker, dtype=np.uint8)).all(axis=1)
+    return hit
+
+
+def parse_ascii_lines(chunk, n_cols):
+    """
+    把多行空白分隔的数值一次解析为二维数组
+
+    :param chunk: bytes，若干以 b'\\n' 结尾的完整行
+    :param n_cols: 每行应有的数值个数
+    :return: (block, valid)
+        block: float64 数组 (n_valid, n_cols)，按行顺序排列的合法行
+        valid: bool 数组 (n_lines,)，每行是否合法 (空行也记为不合法)
+    """
+    arr = np.frombuffer(chunk, dtype=np.uint8)
+    line_starts, line_ends = _line_bounds(arr)
+    n_lines = len(line_ends)
+    if n_lines == 0:
+        return np.empty((0, n_cols)), np.zeros(0, dtype=bool)
+
+    # 逐字节标记：非法字符、token 起点 (前一个字节是空白)
+    bad = ~_ALLOWED[arr]
+    sep = _WHITESPACE[arr]
+    token_start = ~sep
+    token_start[1:] &= sep[:-1]
+
+    # 每行的 token 数与非法字符数 (每段包含该行结尾的 b'\n')
+    tokens_per_line = np.add.reduceat(token_start, line_starts).astype(np.intp)
+    bad_per_line = np.add.reduceat(bad, line_starts)
+    valid = (tokens_per_line == n_cols) & (bad_per_line == 0)
+    if not valid.any():
+        return np.empty((0, n_cols)), valid
+
+    # 合法行中没有小数点/指数时走纯整数的向量化路径 (固件输出 ADC 计数的常见情况)
+    float_chars = np.add.reduceat(_FLOAT_CHARS[arr], line_starts)
+    if not (float_chars[valid] > 0).any():
+        values, token_ok = _parse_int_tokens(arr, sep, token_start)
+        if values is not None:
+            line_of_token = np.repeat(np.arange(n_lines), tokens_per_line)
+            valid &= np.bincount(line_of_token[~token_ok], minlength=n_lines) == 0
+            keep = np.repeat(valid, tokens_per_line)
+            return values[keep].reshape(-1, n_cols), valid
+
+    tokens = chunk.split()
+    if not valid.all():
+        tokens = compress(tokens, np.repeat(valid, tokens_per_line).tolist())
+    try:
+        values = np.fromiter(map(float, tokens), dtype=np.float64)
+    except ValueError:
+        # 字符合法但格式错误 (如 "1.2.3")，仅对本批次逐行回退
+        return _parse_lines_slow(chunk, n_cols, valid)
+    return values.reshape(-1, n_cols), valid
+
+
+def _parse_int_tokens(arr, sep, token_start):
+    """
+    按字节向量化解析整数 token：每个数字乘以 10 的位权后按 token 求和
+
+    :return: (values[float64], token_ok[bool])，token 过长时返回 (None, None)
+    """
+    in_token = np.flatnonzero(~sep)
+    if len(in_token) == 0:
+        return np.empty(0), np.empty(0, dtype=bool)
+    b = arr[in_token]
+    first = token_start[in_token]
+    starts = np.flatnonzero(first)
+    lengths = np.diff(starts, append=len(in_token))
+    if lengths.max() > len(_POW10):
+        return None, None
+
+    pos_from_end = np.repeat(starts + lengths - 1, lengths) - np.arange(len(in_token))
+    digits = b - np.uint8(48)
+    is_digit = digits < 10
+    if is_digit.all():
+        values = np.add.reduceat(digits * _POW10[pos_from_end], starts)
+        return values, np.ones(len(starts), dtype=bool)
+
+    values = np.add.reduceat(np.where(is_digit, digits, 0) * _POW10[pos_from_end], starts)
+    # 符号只能出现在开头，且至少有一位数字
+    is_sign = first & ((b == 45) | (b == 43))
+    bad_bytes = np.add.reduceat(~is_digit & ~is_sign, starts)
+    n_digits = np.add.reduceat(is_digit, starts)
+    token_ok = (bad_bytes == 0) & (n_digits > 0)
+    values[b[starts] == 45] *= -1
+    return values, token_ok
+
+
+def _parse_lines_slow(chunk, n_cols, valid):
+    rows = []
+    for i, line in enumerate(chunk.split(b'\n')[:len(valid)]):
+        if not valid[i]:
+            continue
+        try:
+            rows.append([float(tok) for tok in line.split()])
+        except ValueError:
+            valid[i] = False
+    return np.array(rows, dtype=np.float64).reshape(-1, n_cols), valid
+
+
+def testParseAsciiLines():
+    """回归用例：乱码行 (含 \\x0b \\x0c 等 bytes.split() 也会切分的字节) 之后的合法行仍按原值解析"""
+    cases = [
+        (b"1.5 2 3\n4\x0b5 6\n7.5 8 9\n", [[1.5, 2, 3], [7.5, 8, 9]], [True, False, True]),
+        (b"1 2 3\n4\x0c5 6\n7 8 9\n", [[1, 2, 3], [7, 8, 9]], [True, False, True]),
+        (b"1.5 2 3\n4\x0b5\x0c6 x\n\n7.5 8 9\r\n", [[1.5, 2, 3], [7.5, 8, 9]], [True, False, False, True]),
+        (b"1 2\n1.2.3 4 5\n6 7 8\n", [[6, 7, 8]], [False, False, True]),
+    ]
+    for chunk, rows, valid in cases:
+        block, ok = parse_ascii_lines(chunk, 3)
+        assert ok.tolist() == valid, (chunk, ok)
+        assert np.array_equal(block, np.array(rows, dtype=np.float64).reshape(-1, 3)), (chunk, block)
+    print("parse_ascii_lines: all cases passed")
+
+
+if __name__ == '__main__':
+    testParseAsciiLines()
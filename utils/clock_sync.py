@@ -0,0 +1,120 @@
+import math
+from collections import deque
+
+import numpy as np
+
+
+class ClockModel:
+    def __init__(self, tick_hz=1000.0, counter_bits=32, tau_s=30.0,
+                 envelope_s=2.0, min_span_s=1.0, max_drift=1e-3):
+        """
+        设备时钟 -> 主机单调时钟的在线线性模型 host = offset + (1 + drift) * device
+
+        斜率用指数遗忘的加权最小二乘拟合；偏移取最近 envelope_s 内残差的下包络
+        (传输延迟只会让到达时间变晚，最小残差对应延迟最小的样本)。
+        固定的链路延迟无法与时钟偏移区分，会被并入 offset，
+        因此 latency 表示相对最小延迟路径的附加延迟(USB 批量、缓冲、调度)。
+
+        Parameters:
+            tick_hz (float): 设备计数器频率；若计数器为帧序号则等于采样率
+            counter_bits (int): 计数器位宽，用于回绕展开；None 表示不回绕
+            tau_s (float): 斜率拟合的遗忘时间常数(设备时间, s)
+            envelope_s (float): 偏移下包络的窗口长度(设备时间, s)
+            min_span_s (float): 开始估计漂移前所需的最短观测跨度(s)
+            max_drift (float): 漂移上限(相对值)，1e-3 即 1000 ppm
+        """
+        self.tick_s = 1.0 / tick_hz
+        self.modulus = (1 << counter_bits) if counter_bits else None
+        self.tau_s = tau_s
+        self.envelope_s = envelope_s
+        self.min_span_s = min_span_s
+        self.max_drift = max_drift
+        self.reset()
+
+    def reset(self):
+        self.last_raw = None
+        self.wrap_offset = 0
+        self.x0 = None  # 参考点(设备秒, 主机秒)，避免大数相减损失精度
+        self.y0 = None
+        # 加权回归累计量
+        self.sw = self.sx = self.sy = self.sxx = self.sxy = 0.0
+        self.last_x = None
+        self.first_x = None
+        self.drift = 0.0
+        self.envelope = deque()  # 单调队列 (x, residual)
+        self.latency_s = 0.0      # 附加延迟滑动平均
+        self.latency_max_s = 0.0  # 最近一批的最大附加延迟
+
+    def unwrap(self, raw):
+        """展开回绕的计数器为连续的设备 tick"""
+        raw = int(raw)
+        if self.modulus is not None and self.last_raw is not None:
+            if raw < self.last_raw and self.last_raw - raw > self.modulus // 2:
+                self.wrap_offset += self.modulus
+        self.last_raw = raw
+        return raw + self.wrap_offset
+
+    def update(self, counters, host_t):
+        """
+        输入一批帧的设备计数器与该批次的主机到达时间，返回每帧的主机时间戳
+
+        :param counters: 本批次各帧的原始设备计数器
+        :param host_t: 本批次到达时间(s, 单调时钟)
+        :return: np.ndarray, 每帧的主机时间(s)
+        """
+        ticks = np.array([self.unwrap(c) for c in counters], dtype=np.float64)
+        if self.x0 is None:
+            self.x0 = ticks[-1] * self.tick_s
+            self.y0 = host_t
+            self.first_x = 0.0
+
+        xs = ticks * self.tick_s - self.x0
+        x = xs[-1]  # 最后一帧最接近到达时刻
+        y = host_t - self.y0
+
+        self._fit_slope(x, y)
+        r = y - (1.0 + self.drift) * x
+        self._push_envelope(x, r)
+        offset = self.envelope[0][1]
+
+        t = self.y0 + offset + (1.0 + self.drift) * xs
+        lat = host_t - t
+        self.latency_max_s = float(lat[0])
+        self.latency_s += 0.05 * (float(lat.mean()) - self.latency_s)
+        return t
+
+    def _fit_slope(self, x, y):
+        if self.last_x is not None and x > self.last_x:
+            decay = math.exp(-(x - self.last_x) / self.tau_s)
+            self.sw *= decay
+            self.sx *= decay
+            self.sy *= decay
+            self.sxx *= decay
+            self.sxy *= decay
+        self.last_x = x
+
+        self.sw += 1.0
+        self.sx += x
+        self.sy += y
+        self.sxx += x * x
+        self.sxy += x * y
+
+        if x - self.first_x < self.min_span_s:
+            return
+        var = self.sxx - self.sx * self.sx / self.sw
+        if var <= 0:
+            return
+        slope = (self.sxy - self.sx * self.sy / self.sw) / var
+        self.drift = min(max(slope - 1.0, -self.max_drift), self.max_drift)
+
+    def _push_envelope(self, x, r):
+        # 滑动窗口最小值
+        while self.envelope and self.envelope[-1][1] >= r:
+            self.envelope.pop()
+        self.envelope.append((x, r))
+        while self.envelope[0][0] < x - self.envelope_s:
+            self.envelope.popleft()
+
+    @property
+    def drift_ppm(self):
+        return self.drift * 1e6
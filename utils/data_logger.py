@@ -1,19 +1,45 @@
 import time
-import csv
 import threading
+import queue
+import numpy as np
 from pynput import keyboard
 from pathlib import Path
 from datetime import datetime
+from utils.rate_control import Pacer
+from utils.dtype_policy import DEFAULT_DTYPES
+from utils.recording_archive import ArchiveWriter
 
 
 
 class DataRecorder:
-    def __init__(self, record_rate_hz=100, save_dir="records"):
-        self.record_interval = 1.0 / record_rate_hz
+    def __init__(self, record_rate_hz=100, save_dir="records", dtypes=DEFAULT_DTYPES, chunk_rows=4096,
+                 save_format="csv", metadata=None, codec="zlib"):
+        """
+        Parameters:
+            save_format (str): 'csv' 停止时一次写出 CSV；
+                               'tta' 录制中每满 chunk_rows 行压缩写入归档 (见 utils/recording_archive.py)
+            metadata: dict 或返回 dict 的函数 (开始录制时调用)，写入归档，如 port、baseline、layout
+            codec (str): 归档压缩方式 'zlib' / 'lzma'
+        """
+        if save_format not in ("csv", "tta"):
+            raise ValueError(f"Unknown save format: {save_format}")
+        self.save_format = save_format
+        self.metadata = metadata
+        self.codec = codec
+        self.writer = None
+        self.archive_path = None
+        self.streamed_count = 0  # 已交给归档写入线程的行数
+        self.write_queue = queue.Queue()  # 待压缩写盘的整块 (times, values)，None 表示结束
+        self.write_thread = None
+        self.record_rate_hz = record_rate_hz
+        self.dtypes = dtypes
+        self.chunk_rows = chunk_rows
         self.save_dir = Path(save_dir)
         self.save_dir.mkdir(parents=True, exist_ok=True)
 
-        self.record_data = []
+        # 录制数据按固定行数的数组块存储：(times[float64], values[dtypes.value])
+        self.record_chunks = []
+        self.record_count = 0
         self.latest_value = None
         self.lock = threading.Lock()
 
@@ -26,28 +52,84 @@ class DataRecorder:
         if value is None:
             return
         with self.lock:
-            self.latest_value = value.copy()
+            self.latest_value = np.array(value, dtype=self.dtypes.value)
 
     def _record_loop(self):
         print("[Recorder] Recording started...")
         self.start_time = time.time()
+        pacer = Pacer(self.record_rate_hz)
 
         while self.record_flag:
             with self.lock:
                 if self.latest_value is not None:
                     t = time.time() - self.start_time
-                    self.record_data.append([t] + list(self.latest_value))
-            time.sleep(self.record_interval)
+                    self._append_row(t, self.latest_value)
+            pacer.wait()
 
         print("[Recorder] Recording thread exited.")
 
+    def _append_row(self, t, value):
+        row = self.record_count % self.chunk_rows
+        if row == 0:
+            self.record_chunks.append((np.empty(self.chunk_rows, dtype=np.float64),
+                                       np.empty((self.chunk_rows, len(value)), dtype=self.dtypes.value)))
+        times, values = self.record_chunks[-1]
+        times[row] = t
+        values[row] = value
+        self.record_count += 1
+        if self.save_format == "tta" and row == self.chunk_rows - 1:
+            self._stream_rows()
+
+    def _stream_rows(self):
+        """把内存中的行交给写入线程并释放 (调用方持有 self.lock；压缩和写盘不在锁内进行)"""
+        times, values = self.get_recorded()
+        if len(times) == 0:
+            return
+        self.write_queue.put((times, values))
+        self.streamed_count += len(times)
+        self.record_chunks = []
+
+    def _write_loop(self):
+        """归档写入线程：压缩并写盘，不阻塞 update_value 和录制节拍"""
+        while True:
+            item = self.write_queue.get()
+            if item is None:
+                break
+            times, values = item
+            if self.writer is None:
+                metadata = self.metadata() if callable(self.metadata) else dict(self.metadata or {})
+                metadata.setdefault('rate_hz', self.record_rate_hz)
+                metadata['start_time'] = self.start_time
+                self.writer = ArchiveWriter(self.archive_path, values.shape[1], self.dtypes.value,
+                                            chunk_rows=self.chunk_rows, codec=self.codec, metadata=metadata)
+            self.writer.write(np.round(times * 1e9).astype(np.int64), values)
+        if self.writer is not None:
+            self.writer.close()
+
+    def get_recorded(self):
+        """返回内存中已录制、尚未写入归档的 (times[n], values[n, channels])"""
+        n = self.record_count - self.streamed_count
+        if n == 0:
+            return np.empty(0), np.empty((0, 0), dtype=self.dtypes.value)
+        times = np.concatenate([t for t, _ in self.record_chunks])[:n]
+        values = np.concatenate([v for _, v in self.record_chunks])[:n]
+        return times, values
+
     # 开始录制
     def start_recording(self):
         if self.record_flag:
             print("[Recorder] Already recording.")
             return
 
-        self.record_data = []
+        self.record_chunks = []
+        self.record_count = 0
+        self.streamed_count = 0
+        self.writer = None
+        if self.save_format == "tta":
+            self.archive_path = self.save_dir / f"{datetime.now().strftime('%Y%m%d_%H%M%S')}.tta"
+            self.write_queue = queue.Queue()
+            self.write_thread = threading.Thread(target=self._write_loop, daemon=True)
+            self.write_thread.start()
         self.record_flag = True
 
         self.record_thread = threading.Thread(target=self._record_loop, daemon=True)
@@ -61,22 +143,38 @@ class DataRecorder:
 
         self.record_flag = False
         self.record_thread.join()
+        if self.save_format == "tta":
+            # 剩余的行交给写入线程，等待全部写盘并关闭归档
+            with self.lock:
+                self._stream_rows()
+            self.write_queue.put(None)
+            self.write_thread.join()
 
-        if len(self.record_data) == 0:
+        if self.record_count == 0:
             print("[Recorder] No data to save.")
             return
 
+        if self.save_format == "tta":
+            save_path = self.archive_path
+            if filename is not None:
+                save_path = self.save_dir / filename
+                save_path = save_path.parent / (save_path.stem + ".tta")
+                self.archive_path.rename(save_path)
+            print(f"[Recorder] Saved → {save_path} ({self.record_count} rows)")
+            return
+
         if filename is None:
             now = datetime.now().strftime("%Y%m%d_%H%M%S")
             filename = f"{now}.csv"
 
         save_path = self.save_dir / filename
 
-        with open(save_path, "w", newline="") as f:
-            writer = csv.writer(f)
-            header = ["timestamp"] + [f"value_{i}" for i in range(len(self.record_data[0]) - 1)]
-            writer.writerow(header)
-            writer.writerows(self.record_data)
+        times, values = self.get_recorded()
+        header = ",".join(["timestamp"] + [f"value_{i}" for i in range(values.shape[1])])
+        # float32 需 9 位有效数字才能无损往返，与 archive_to_csv 导出的数值一致
+        fmt = ["%.6f"] + ["%.9g" if values.dtype.itemsize <= 4 else "%.17g"] * values.shape[1]
+        np.savetxt(save_path, np.column_stack([times, values]), delimiter=",",
+                   header=header, comments="", fmt=fmt)
 
         print(f"[Recorder] Saved → {save_path}")
 
@@ -0,0 +1,114 @@
+import sys
+import time
+
+import numpy as np
+
+
+class DtypePolicy:
+    def __init__(self, raw='float32', value='float32', geometry='float32'):
+        """
+        采集 -> 录制 -> 渲染全链路的数据类型约定
+
+        Parameters:
+            raw (str): 串口原始数值，默认 'float32' (固件输出小数也不丢精度)；
+                       确认固件只输出整数计数时可选 'int16' / 'int32'，
+                       此时非整数或越界的行被拒收 (见 raw_fits)，不会截断或回绕
+            value (str): 校准后的数值 (基线、最新帧、历史曲线、录制数据)
+            geometry (str): 顶点、颜色、插值权重等几何数据
+        """
+        self.raw = np.dtype(raw)
+        self.value = np.dtype(value)
+        self.geometry = np.dtype(geometry)
+        if self.raw.kind not in 'iuf':
+            raise ValueError(f"Unsupported raw dtype: {raw}")
+        if self.value.kind != 'f' or self.geometry.kind != 'f':
+            raise ValueError("value / geometry dtype must be floating point")
+
+    @property
+    def raw_is_int(self):
+        return self.raw.kind in 'iu'
+
+    def raw_fits(self, block):
+        """
+        每行数值能否无损存为 raw 类型
+
+        :param block: (n, m) 解析得到的 float64 数值
+        :return: bool 数组 (n,)；浮点 raw 类型总是 True，整数类型要求为整数且在取值范围内
+        """
+        block = np.asarray(block)
+        if not self.raw_is_int:
+            return np.ones(len(block), dtype=bool)
+        info = np.iinfo(self.raw)
+        ok = (block >= info.min) & (block <= info.max) & (block == np.round(block))
+        return ok.reshape(len(block), -1).all(axis=1)
+
+    def calibrate(self, raw_values, baseline):
+        """raw - baseline，结果直接为 value 类型 (避免 int32 - float32 提升为 float64)"""
+        return np.subtract(raw_values, baseline, dtype=self.value)
+
+    def __repr__(self):
+        return f"DtypePolicy(raw={self.raw}, value={self.value}, geometry={self.geometry})"
+
+
+DEFAULT_DTYPES = DtypePolicy()
+# 整数原始计数 (需固件只输出整数)
+INT_DTYPES = DtypePolicy('int32')
+# 旧版全 float64 行为，仅用于对比测试
+LEGACY_DTYPES = DtypePolicy('float64', 'float64', 'float64')
+
+
+def _time_per_call(fn, n):
+    t0 = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - t0) / n * 1e6  # us
+
+
+def benchmarkDtypePolicy(n=20000, hours=1.0):
+    """对比旧版 float64 与紧凑类型策略在各环节的内存和吞吐 (不含GUI)"""
+    from utils.serialReader import SerialDataHandler
+    from utils.data_logger import DataRecorder
+    from utils.rbf_operator import rbf_operator
+    from utils.RbfVis import STLProcessor, real_sensor_coords
+
+    stl_points = STLProcessor.load_data("model/processed_stl_data.npy")['points']
+    raster = np.random.uniform(-15, 20, (1550, 2))
+
+    for name, policy in (("float64", LEGACY_DTYPES), ("compact", DEFAULT_DTYPES), ("int raw", INT_DTYPES)):
+        handler = SerialDataHandler(num_sensors=8, simulate=True, calibration_frames=0, dtypes=policy)
+        handler.data_buffer = type(handler.data_buffer)(maxlen=1)
+        parse_us = _time_per_call(handler.read_latest, n)
+
+        history = np.zeros((8, 250), dtype=policy.value)
+        frame = handler.latest_data
+
+        def roll():
+            h = np.roll(history, -1, axis=1)
+            h[:, -1] = frame
+        roll_us = _time_per_call(roll, n)
+
+        weights = rbf_operator(real_sensor_coords[:, [0, 2]], raster, dtype=policy.geometry)
+        values = frame.astype(policy.geometry)
+        matvec_us = _time_per_call(lambda: weights @ values, n)
+
+        rec = DataRecorder(save_dir="/tmp/dtype_bench", dtypes=policy)
+        append_us = _time_per_call(lambda: rec._append_row(0.0, frame), n)
+        rows = int(hours * 3600 * rec.record_rate_hz)
+        rec_mb = rows * (8 + 8 * policy.value.itemsize) / 1e6
+
+        geometry_kb = stl_points.size * policy.geometry.itemsize * 2 / 1e3  # 顶点 + 颜色
+        print(f"[{name}] {policy}")
+        print(f"  frame bytes      : raw {8 * policy.raw.itemsize} B, value {frame.nbytes} B")
+        print(f"  parse            : {parse_us:.2f} us/frame")
+        print(f"  history roll     : {roll_us:.2f} us/frame ({history.nbytes} B)")
+        print(f"  raster matvec    : {matvec_us:.2f} us/frame ({weights.nbytes / 1e3:.0f} kB)")
+        print(f"  recorder append  : {append_us:.2f} us/row ({rec_mb:.1f} MB per {hours:g} h)")
+        if policy is LEGACY_DTYPES:
+            # 旧版 DataRecorder 每行是 [t] + list(values)：列表 + 9 个 Python float 对象
+            legacy_mb = rows * (sys.getsizeof([0.0] * 9) + 9 * sys.getsizeof(0.0)) / 1e6
+            print(f"  recorder (list)  : {legacy_mb:.1f} MB per {hours:g} h")
+        print(f"  mesh geometry    : {geometry_kb:.0f} kB")
+
+
+if __name__ == '__main__':
+    benchmarkDtypePolicy()
@@ -0,0 +1,447 @@
+import socket
+import struct
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from utils.rate_control import Pacer
+
+# == 二进制帧格式 == #
+# 消息 = 头部 + int64[n] 时间戳(monotonic_ns) + dtype[n, channels] 数值，均为小端
+# 头部: magic(2s) version(B) dtype(B) channels(H) n_frames(H) seq(I)
+HEADER = struct.Struct('<2sBBHHI')
+MAGIC = b'TT'
+VERSION = 1
+DTYPES = {0: np.dtype('<f4'), 1: np.dtype('<f8'), 2: np.dtype('<i2'), 3: np.dtype('<i4')}
+DTYPE_CODES = {dt: code for code, dt in DTYPES.items()}
+
+UDP_SUBSCRIBE = b'SUB'
+UDP_UNSUBSCRIBE = b'BYE'
+UDP_MAX_PAYLOAD = 65000
+
+
+def pack_frames(times_ns, block, seq, dtype='<f4'):
+    """把 n 帧打包为一条消息"""
+    block = np.atleast_2d(np.asarray(block, dtype=dtype))
+    times_ns = np.asarray(times_ns, dtype='<i8').reshape(-1)
+    n, channels = block.shape
+    header = HEADER.pack(MAGIC, VERSION, DTYPE_CODES[block.dtype], channels, n, seq & 0xFFFFFFFF)
+    return header + times_ns.tobytes() + block.tobytes()
+
+
+def max_frames_per_message(channels, dtype='<f4'):
+    """单条消息最多容纳的帧数：头部 n_frames 为 uint16，且整条消息不超过 UDP_MAX_PAYLOAD"""
+    frame_bytes = 8 + channels * np.dtype(dtype).itemsize
+    return max(1, min(0xFFFF, (UDP_MAX_PAYLOAD - HEADER.size) // frame_bytes))
+
+
+def message_size(header_bytes):
+    """根据头部计算整条消息的字节数"""
+    magic, version, code, channels, n, _ = HEADER.unpack_from(header_bytes)
+    if magic != MAGIC or version != VERSION or code not in DTYPES:
+        raise ValueError("Bad frame header")
+    return HEADER.size + n * 8 + n * channels * DTYPES[code].itemsize
+
+
+def unpack_frames(buf, offset=0):
+    """
+    解析一条消息
+
+    :return: (seq, times_ns[n], block[n, channels], 消息字节数)
+    """
+    magic, version, code, channels, n, seq = HEADER.unpack_from(buf, offset)
+    if magic != MAGIC or version != VERSION or code not in DTYPES:
+        raise ValueError("Bad frame header")
+    dtype = DTYPES[code]
+    pos = offset + HEADER.size
+    times_ns = np.frombuffer(buf, dtype='<i8', count=n, offset=pos)
+    pos += n * 8
+    block = np.frombuffer(buf, dtype=dtype, count=n * channels, offset=pos).reshape(n, channels)
+    size = HEADER.size + n * 8 + n * channels * dtype.itemsize
+    return seq, times_ns, block, size
+
+
+class _Subscriber:
+    def __init__(self, send, name, queue_size, close=None):
+        """
+        单个订阅者：有界队列(满时丢弃最旧消息) + 独立发送线程
+
+        :param close: 停止时调用一次，用于关闭该订阅者独占的连接 (TCP)
+        """
+        self.send = send
+        self.close = close
+        self.name = name
+        self.queue = deque(maxlen=queue_size)
+        self.cond = threading.Condition()
+        self.alive = True
+        self.sent = 0
+        self.dropped = 0
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def push(self, msg):
+        with self.cond:
+            if len(self.queue) == self.queue.maxlen:
+                self.dropped += 1
+            self.queue.append(msg)
+            self.cond.notify()
+
+    def _run(self):
+        while self.alive:
+            with self.cond:
+                while not self.queue and self.alive:
+                    self.cond.wait(0.5)
+                msgs = list(self.queue)
+                self.queue.clear()
+            if not msgs:
+                continue
+            try:
+                self.send(msgs)
+                self.sent += len(msgs)
+            except OSError:
+                self.stop()
+
+    def stop(self):
+        with self.cond:
+            close, self.close = self.close, None
+            self.alive = False
+            self.cond.notify()
+        if close is not None:
+            try:
+                close()
+            except OSError:
+                pass
+
+
+class FrameServer:
+    def __init__(self, handler=None, host='127.0.0.1', tcp_port=9870, udp_port=9871,
+                 queue_size=256, dtype='<f4', poll_hz=1000, udp_timeout=5.0):
+        """
+        帧服务器：独占串口读取一次，把校准后的帧通过 TCP/UDP 发布给多个订阅者
+
+        Parameters:
+            handler: SerialDataHandler 实例，None 时只能手动 publish
+            host (str): 监听地址，'0.0.0.0' 对局域网开放
+            tcp_port (int): TCP 端口，None 表示不启用
+            udp_port (int): UDP 端口，None 表示不启用；客户端发送 'SUB' 订阅
+            queue_size (int): 每个订阅者的队列长度(消息数)
+            dtype (str): 发送的数据类型
+            poll_hz (float): 串口轮询频率
+            udp_timeout (float): UDP 订阅者无心跳超时(s)
+        """
+        self.handler = handler
+        self.host = host
+        self.tcp_port = tcp_port
+        self.udp_port = udp_port
+        self.queue_size = queue_size
+        self.dtype = np.dtype(dtype)
+        self.poll_hz = poll_hz
+        self.udp_timeout = udp_timeout
+
+        self.seq = 0
+        self.subscribers = []
+        self.udp_clients = {}  # addr -> (_Subscriber, last_seen)
+        self.lock = threading.Lock()
+        self.running = False
+        self.tcp_sock = None
+        self.udp_sock = None
+        self.threads = []
+
+    # ------------------------------------------------------------------ #
+    def start(self):
+        self.running = True
+        if self.tcp_port is not None:
+            self.tcp_sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.tcp_sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            self.tcp_sock.bind((self.host, self.tcp_port))
+            self.tcp_sock.listen()
+            self.tcp_sock.settimeout(0.5)
+            self.tcp_port = self.tcp_sock.getsockname()[1]
+            self.threads.append(threading.Thread(target=self._accept_loop, daemon=True))
+        if self.udp_port is not None:
+            self.udp_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.udp_sock.bind((self.host, self.udp_port))
+            self.udp_sock.settimeout(0.5)
+            self.udp_port = self.udp_sock.getsockname()[1]
+            self.threads.append(threading.Thread(target=self._udp_control_loop, daemon=True))
+        for t in self.threads:
+            t.start()
+
+        if self.handler is not None:
+            self.handler.add_block_sink(self.publish_block)
+        print(f"[FrameServer] tcp={self.tcp_port} udp={self.udp_port} on {self.host}")
+
+    def _add_subscriber(self, send, name, close=None):
+        sub = _Subscriber(send, name, self.queue_size, close)
+        with self.lock:
+            self.subscribers.append(sub)
+        sub.thread.start()
+        return sub
+
+    def _accept_loop(self):
+        while self.running:
+            try:
+                conn, addr = self.tcp_sock.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self._add_subscriber(lambda msgs, c=conn: c.sendall(b''.join(msgs)), f"tcp:{addr}", conn.close)
+            print(f"[FrameServer] TCP subscriber {addr}")
+
+    def _udp_control_loop(self):
+        while self.running:
+            try:
+                data, addr = self.udp_sock.recvfrom(64)
+            except socket.timeout:
+                data, addr = None, None
+            except OSError:
+                break
+
+            now = time.monotonic()
+            if data == UDP_SUBSCRIBE:
+                if addr in self.udp_clients and self.udp_clients[addr][0].alive:
+                    self.udp_clients[addr][1] = now
+                else:
+                    def send(msgs, a=addr):
+                        for m in msgs:
+                            self.udp_sock.sendto(m, a)
+                    # 新地址，或原订阅者发送出错已停止 (已从 subscribers 中移除)：重新订阅
+                    sub = self._add_subscriber(send, f"udp:{addr}")
+                    self.udp_clients[addr] = [sub, now]
+                    print(f"[FrameServer] UDP subscriber {addr}")
+            elif data == UDP_UNSUBSCRIBE and addr in self.udp_clients:
+                self.udp_clients.pop(addr)[0].stop()
+
+            for a, (sub, last_seen) in list(self.udp_clients.items()):
+                if now - last_seen > self.udp_timeout:
+                    sub.stop()
+                    del self.udp_clients[a]
+
+    # ------------------------------------------------------------------ #
+    def publish(self, t_ns, values):
+        """发布一帧 (可直接作为 handler 的 frame sink)"""
+        self.publish_block([t_ns], np.asarray(values).reshape(1, -1))
+
+    def publish_block(self, times_ns, block):
+        """发布 n 帧 (times_ns[n], block[n, channels])，超过单条消息上限时按序拆成多条"""
+        times_ns = np.asarray(times_ns)
+        block = np.asarray(block).astype(self.dtype, copy=False)
+        step = max_frames_per_message(block.shape[1], self.dtype)
+        msgs = []
+        for i in range(0, len(block), step):
+            msgs.append(pack_frames(times_ns[i:i + step], block[i:i + step], self.seq, dtype=self.dtype))
+            self.seq += 1
+        with self.lock:
+            self.subscribers = [s for s in self.subscribers if s.alive]
+            subs = list(self.subscribers)
+        for sub in subs:
+            for msg in msgs:
+                sub.push(msg)
+
+    def get_stats(self):
+        """各订阅者的发送/丢弃计数"""
+        with self.lock:
+            return {s.name: {'sent': s.sent, 'dropped': s.dropped, 'queued': len(s.queue)}
+                    for s in self.subscribers}
+
+    def serve_forever(self, should_stop=lambda: False):
+        """轮询串口直到 should_stop() 返回 True"""
+        pacer = Pacer(self.poll_hz)
+        while self.running and not should_stop():
+            self.handler.poll()
+            pacer.wait()
+        self.close()
+
+    def close(self):
+        self.running = False
+        if self.handler is not None:
+            self.handler.remove_block_sink(self.publish_block)
+        with self.lock:
+            for sub in self.subscribers:
+                sub.stop()
+        for s in (self.tcp_sock, self.udp_sock):
+            if s is not None:
+                s.close()
+        print("[FrameServer] closed")
+
+
+class FrameClient:
+    def __init__(self, host='127.0.0.1', port=9870, transport='tcp', num_sensors=8,
+                 history=1024):
+        """
+        帧服务器客户端，接口与 SerialDataHandler.read_latest() 一致
+
+        Parameters:
+            host (str): 服务器地址
+            port (int): 服务器 TCP 或 UDP 端口
+            transport (str): 'tcp' 或 'udp'
+            num_sensors (int): 收到第一帧前 read_latest() 返回的零向量长度
+            history (int): 缓存最近帧的数量，供 read_frames() 取用
+        """
+        self.host = host
+        self.port = port
+        self.transport = transport
+        self.latest_data = np.zeros(num_sensors, dtype=np.float32)
+        self.latest_time_ns = 0
+        self.frames = deque(maxlen=history)  # (t_ns, values)
+        self.lock = threading.Lock()
+        self.received = 0
+        self.lost = 0  # 根据消息序号推算的丢失数
+        self.last_seq = None
+        self.running = True
+        self.on_frames = None  # 可选回调 on_frames(times_ns, block)
+
+        if transport == 'tcp':
+            self.sock = socket.create_connection((host, port))
+            self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            target = self._tcp_loop
+        elif transport == 'udp':
+            self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 20)
+            self.sock.settimeout(0.5)
+            self.sock.sendto(UDP_SUBSCRIBE, (host, port))
+            target = self._udp_loop
+        else:
+            raise ValueError(f"Unknown transport: {transport}")
+
+        self.thread = threading.Thread(target=target, daemon=True)
+        self.thread.start()
+
+    def _handle(self, seq, times_ns, block):
+        if self.last_seq is not None:
+            self.lost += (seq - self.last_seq - 1) & 0xFFFFFFFF
+        self.last_seq = seq
+        with self.lock:
+            self.latest_data = block[-1].copy()
+            self.latest_time_ns = int(times_ns[-1])
+            self.frames.extend(zip(times_ns.tolist(), block))
+            self.received += len(block)
+        if self.on_frames is not None:
+            self.on_frames(times_ns, block)
+
+    def _tcp_loop(self):
+        buf = bytearray()
+        while self.running:
+            try:
+                data = self.sock.recv(1 << 16)
+            except OSError:
+                break
+            if not data:
+                break
+            buf.extend(data)
+
+            offset = 0
+            while len(buf) - offset >= HEADER.size:
+                size = message_size(buf[offset:offset + HEADER.size])
+                if len(buf) - offset < size:
+                    break
+                seq, times_ns, block, _ = unpack_frames(bytes(buf[offset:offset + size]))
+                self._handle(seq, times_ns, block)
+                offset += size
+            del buf[:offset]
+        self.running = False
+
+    def _udp_loop(self):
+        last_keepalive = time.monotonic()
+        while self.running:
+            now = time.monotonic()
+            if now - last_keepalive > 1.0:
+                self.sock.sendto(UDP_SUBSCRIBE, (self.host, self.port))
+                last_keepalive = now
+            try:
+                data = self.sock.recv(UDP_MAX_PAYLOAD)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            try:
+                seq, times_ns, block, _ = unpack_frames(data)
+            except (ValueError, struct.error):
+                continue
+            self._handle(seq, times_ns, block)
+
+    def read_latest(self):
+        """获取最新数据帧（无阻塞）"""
+        with self.lock:
+            return self.latest_data.copy()
+
+    def read_frames(self):
+        """取出自上次调用以来缓存的所有帧 [(t_ns, values), ...]"""
+        with self.lock:
+            frames = list(self.frames)
+            self.frames.clear()
+        return frames
+
+    def close(self):
+        self.running = False
+        if self.transport == 'udp':
+            try:
+                self.sock.sendto(UDP_UNSUBSCRIBE, (self.host, self.port))
+            except OSError:
+                pass
+        self.sock.close()
+
+
+def benchmarkLoopback(n_frames=20000, channels=8, n_clients=4, transport='tcp', rate_hz=None):
+    """
+    本机回环吞吐/延迟测试：服务器直接 publish 合成帧，多个客户端接收
+
+    :param rate_hz: 发布频率，None 表示尽可能快(测吞吐)
+    """
+    server = FrameServer(tcp_port=0 if transport == 'tcp' else None,
+                         udp_port=0 if transport == 'udp' else None,
+                         queue_size=4096)
+    server.start()
+    port = server.tcp_port if transport == 'tcp' else server.udp_port
+
+    latencies = [[] for _ in range(n_clients)]
+    clients = []
+    for i in range(n_clients):
+        c = FrameClient(port=port, transport=transport, num_sensors=channels)
+        c.on_frames = (lambda times_ns, block, lat=latencies[i]:
+                       lat.extend((time.monotonic_ns() - times_ns).tolist()))
+        clients.append(c)
+
+    # 等待订阅建立
+    deadline = time.monotonic() + 2.0
+    while len(server.subscribers) < n_clients and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    block = np.random.uniform(0, 1000, (1, channels))
+    pacer = Pacer(rate_hz) if rate_hz else None
+    t0 = time.monotonic()
+    for _ in range(n_frames):
+        server.publish_block([time.monotonic_ns()], block)
+        if pacer is not None:
+            pacer.wait()
+    publish_s = time.monotonic() - t0
+
+    deadline = time.monotonic() + 2.0
+    while (sum(c.received for c in clients) < n_frames * n_clients
+           and time.monotonic() < deadline):
+        time.sleep(0.01)
+    total_s = time.monotonic() - t0
+
+    lat = np.concatenate([np.asarray(l, dtype=np.float64) for l in latencies]) * 1e-6
+    received = sum(c.received for c in clients)
+    print(f"[{transport}] {n_clients} clients, {n_frames} frames x {channels} ch")
+    print(f"  publish rate     : {n_frames / publish_s:,.0f} frames/s")
+    print(f"  delivered        : {received}/{n_frames * n_clients} "
+          f"({received / total_s:,.0f} frames/s total)")
+    print(f"  dropped (server) : {sum(s['dropped'] for s in server.get_stats().values())}")
+    if len(lat):
+        print(f"  latency ms       : p50 {np.percentile(lat, 50):.3f}  "
+              f"p99 {np.percentile(lat, 99):.3f}  max {lat.max():.3f}")
+
+    for c in clients:
+        c.close()
+    server.close()
+
+
+if __name__ == '__main__':
+    benchmarkLoopback(transport='tcp')
+    benchmarkLoopback(transport='udp')
+    benchmarkLoopback(n_frames=2000, transport='tcp', rate_hz=500)
@@ -0,0 +1,379 @@
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from utils.ascii_parser import take_complete_lines, parse_ascii_lines
+from utils.recording_archive import ArchiveWriter, ArchiveReader
+
+CATALOG_NAME = "catalog.json"
+CATALOG_VERSION = 1
+_COMMA_TO_SPACE = bytes.maketrans(b',', b' ')
+
+
+def iter_csv_blocks(path, block_bytes=1 << 20):
+    """
+    按块流式读取 DataRecorder 的 CSV，内存占用与文件大小无关
+
+    :return: 依次产生 (times_ns[n], values[n, channels])，时间戳由相对秒转换为整数纳秒
+    """
+    with open(path, 'rb') as f:
+        header = f.readline().decode().strip().split(',')
+        n_cols = len(header)
+        buffer = bytearray()
+        while True:
+            data = f.read(block_bytes)
+            if data:
+                buffer.extend(data)
+            elif buffer and not buffer.endswith(b'\n'):
+                buffer.extend(b'\n')  # 最后一行没有换行符
+            chunk = take_complete_lines(buffer)
+            if chunk is not None:
+                block, _ = parse_ascii_lines(chunk.translate(_COMMA_TO_SPACE), n_cols)
+                if len(block):
+                    yield np.round(block[:, 0] * 1e9).astype(np.int64), block[:, 1:]
+            if not data:
+                return
+
+
+def iter_recording_blocks(path):
+    """读取 CSV 或 .tta 录制文件，返回 (块迭代器, 元数据)"""
+    if str(path).endswith('.tta'):
+        reader = ArchiveReader(path)
+
+        def blocks():
+            with reader:
+                yield from reader.iter_chunks()
+        return blocks(), dict(reader.metadata)
+    return iter_csv_blocks(path), {}
+
+
+class RecordingStats:
+    def __init__(self, channels, reservoir_size=65536, press_on=30.0, press_off=15.0, seed=0):
+        """
+        流式统计：每块更新一次，内存只与通道数和采样池大小有关
+
+        Parameters:
+            channels (int): 通道数
+            reservoir_size (int): 百分位数使用的均匀采样池大小 (帧数不超过该值时为精确值)
+            press_on / press_off (float): 按压检测的滞回阈值 (校准后数值)，
+                                          高于 press_on 开始按压，低于 press_off 结束
+        """
+        self.channels = channels
+        self.count = 0
+        self.min = np.full(channels, np.inf)
+        self.max = np.full(channels, -np.inf)
+        self.sum = np.zeros(channels)
+        self.sum_sq = np.zeros(channels)
+        self.t_first = None
+        self.t_last = None
+
+        self.reservoir = np.empty((reservoir_size, channels))
+        self.rng = np.random.default_rng(seed)
+
+        self.press_on = press_on
+        self.press_off = press_off
+        self.pressed = np.zeros(channels, dtype=bool)
+        self.press_start = np.zeros(channels, dtype=np.int64)
+        self.press_count = np.zeros(channels, dtype=np.int64)
+        self.press_time_ns = np.zeros(channels, dtype=np.int64)
+
+    def update(self, times_ns, block):
+        n = len(block)
+        if n == 0:
+            return
+        block = np.asarray(block, dtype=np.float64)
+        if self.t_first is None:
+            self.t_first = int(times_ns[0])
+        self.t_last = int(times_ns[-1])
+
+        np.minimum(self.min, block.min(axis=0), out=self.min)
+        np.maximum(self.max, block.max(axis=0), out=self.max)
+        self.sum += block.sum(axis=0)
+        self.sum_sq += np.einsum('ij,ij->j', block, block)
+        self._update_reservoir(block)
+        self._update_presses(np.asarray(times_ns, dtype=np.int64), block)
+        self.count += n
+
+    def _update_reservoir(self, block):
+        """Algorithm R 的向量化版本：第 i 帧以 K/(i+1) 的概率替换采样池中的随机位置"""
+        size = len(self.reservoir)
+        index = self.count + np.arange(len(block))
+        fill = index < size
+        self.reservoir[index[fill]] = block[fill]
+        rest = np.flatnonzero(~fill)
+        if len(rest):
+            slot = self.rng.integers(0, index[rest] + 1)
+            hit = slot < size
+            self.reservoir[slot[hit]] = block[rest[hit]]
+
+    def _update_presses(self, times_ns, block):
+        """滞回比较：每帧的按压状态等于最近一次越过阈值的方向，状态跨块延续"""
+        n = len(block)
+        mark = np.where(block > self.press_on, 1, np.where(block < self.press_off, -1, 0))
+        # 在每块前加上上一块结束时的状态，向前填充最近一次非零标记
+        mark = np.vstack([np.where(self.pressed, 1, -1)[None, :], mark])
+        last = np.where(mark != 0, np.arange(n + 1)[:, None], 0)
+        np.maximum.accumulate(last, axis=0, out=last)
+        state = np.take_along_axis(mark, last, axis=0) > 0
+
+        rising = ~state[:-1] & state[1:]
+        falling = state[:-1] & ~state[1:]
+        self.press_count += rising.sum(axis=0)
+
+        # 按压时长 = 各次 (结束时刻 - 开始时刻)，跨块的按压用上一块记录的开始时刻
+        t = times_ns[:, None]
+        ended = np.where(falling, t, 0).sum(axis=0)
+        started = np.where(rising, t, 0).sum(axis=0)
+        last_rise = np.where(rising, t, -1).max(axis=0)
+        still = state[-1]
+        opened = still & (last_rise >= 0)  # 本块开始、尚未结束的按压
+        started -= np.where(opened, last_rise, 0)
+        closed_carry = self.pressed & falling.any(axis=0)  # 上一块开始、本块结束的按压
+        started += np.where(closed_carry, self.press_start, 0)
+        self.press_time_ns += ended - started
+
+        self.press_start = np.where(opened, last_rise, self.press_start)
+        self.pressed = still
+
+    def result(self, percentiles=(1, 5, 50, 95, 99)):
+        if self.count == 0:
+            return {'frames': 0}
+        mean = self.sum / self.count
+        std = np.sqrt(np.maximum(self.sum_sq / self.count - mean ** 2, 0.0))
+        sample = self.reservoir[:min(self.count, len(self.reservoir))]
+        pct = np.percentile(sample, percentiles, axis=0)
+        duration_s = (self.t_last - self.t_first) * 1e-9
+        return {
+            'frames': int(self.count),
+            'duration_s': duration_s,
+            'rate_hz': (self.count - 1) / duration_s if duration_s > 0 else None,
+            'min': self.min.tolist(),
+            'max': self.max.tolist(),
+            'mean': mean.tolist(),
+            'std': std.tolist(),
+            'percentiles': {str(p): row.tolist() for p, row in zip(percentiles, pct)},
+            'press_count': self.press_count.tolist(),
+            # 录制结束时仍在按压的部分计到最后一帧
+            'press_time_s': ((self.press_time_ns + np.where(self.pressed, self.t_last - self.press_start, 0))
+                             * 1e-9).tolist(),
+            'pressed_at_end': self.pressed.tolist(),
+        }
+
+
+def process_recording(path, out_dir=None, codec='zlib', press_on=30.0, press_off=15.0):
+    """
+    单个录制文件：CSV 转为 .tta 归档 (out_dir 为 None 时不转换) 并计算统计，返回目录条目
+    """
+    path = Path(path)
+    t0 = time.perf_counter()
+    blocks, metadata = iter_recording_blocks(path)
+    stats = writer = None
+    archive = None
+    for times_ns, block in blocks:
+        if stats is None:
+            stats = RecordingStats(block.shape[1], press_on=press_on, press_off=press_off)
+            if out_dir is not None and path.suffix == '.csv':
+                archive = Path(out_dir) / (path.stem + '.tta')
+                writer = ArchiveWriter(archive, block.shape[1], 'float32', codec=codec,
+                                       metadata={'source': path.name})
+        stats.update(times_ns, block)
+        if writer is not None:
+            writer.write(times_ns, block)
+    if writer is not None:
+        writer.close()
+
+    st = path.stat()
+    return {
+        'file': path.name,
+        'size': st.st_size,
+        'mtime': st.st_mtime,
+        'archive': archive.name if archive is not None else (path.name if path.suffix == '.tta' else None),
+        'channels': stats.channels if stats is not None else 0,
+        'metadata': metadata,
+        'stats': stats.result() if stats is not None else {'frames': 0},
+        'process_s': time.perf_counter() - t0,
+    }
+
+
+def _process_job(args):
+    path, out_dir, codec, press_on, press_off = args
+    try:
+        return process_recording(path, out_dir, codec, press_on, press_off)
+    except Exception as e:  # 单个损坏文件不影响整批
+        return {'file': Path(path).name, 'error': f"{type(e).__name__}: {e}"}
+
+
+def load_catalog(log_dir):
+    path = Path(log_dir) / CATALOG_NAME
+    if not path.exists():
+        return {'version': CATALOG_VERSION, 'files': {}}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_catalog(log_dir, catalog):
+    """原子写入：先写临时文件再替换，避免中断时留下损坏的目录"""
+    path = Path(log_dir) / CATALOG_NAME
+    tmp = path.with_suffix('.json.tmp')
+    with open(tmp, 'w') as f:
+        json.dump(catalog, f, indent=1, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def build_catalog(log_dir="data_logs", out_dir=None, workers=None, codec='zlib',
+                  press_on=30.0, press_off=15.0, force=False):
+    """
+    并行处理目录下所有录制文件并更新目录索引
+
+    Parameters:
+        log_dir (str): 录制目录 (*.csv / *.tta)
+        out_dir (str): 转换后的 .tta 输出目录，None 时放在 log_dir/archive
+        workers (int): 进程数，None 为 CPU 核数
+        force (bool): False 时跳过大小和修改时间都未变化的文件
+    :return: 目录 dict
+    """
+    log_dir = Path(log_dir)
+    out_dir = Path(out_dir) if out_dir is not None else log_dir / "archive"
+    out_dir.mkdir(parents=True, exist_ok=True)
+    catalog = load_catalog(log_dir)
+    entries = catalog['files']
+
+    csv_names = {p.stem for p in log_dir.glob("*.csv")}
+    todo = []
+    for path in sorted(log_dir.glob("*.csv")) + sorted(log_dir.glob("*.tta")):
+        if path.suffix == '.tta' and path.stem in csv_names:
+            continue
+        old = entries.get(path.name)
+        st = path.stat()
+        if not force and old and 'error' not in old and old['size'] == st.st_size and old['mtime'] == st.st_mtime:
+            continue
+        todo.append((str(path), str(out_dir), codec, press_on, press_off))
+
+    t0 = time.perf_counter()
+    if todo:
+        if workers == 1 or len(todo) == 1:
+            results = list(map(_process_job, todo))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(_process_job, todo))
+        for entry in results:
+            entries[entry['file']] = entry
+            if 'error' in entry:
+                print(f"[batch] {entry['file']}: {entry['error']}")
+
+    # 删除已不存在的文件
+    for name in [n for n in entries if not (log_dir / n).exists()]:
+        del entries[name]
+    catalog['archive_dir'] = os.path.relpath(out_dir, log_dir)
+    catalog['updated'] = time.strftime("%Y-%m-%d %H:%M:%S")
+    save_catalog(log_dir, catalog)
+    print(f"[batch] {len(todo)} processed, {len(entries) - len(todo)} unchanged, "
+          f"{time.perf_counter() - t0:.2f} s")
+    return catalog
+
+
+def query_catalog(catalog, min_duration_s=None, min_presses=None, channel=None, min_peak=None,
+                  metadata=None):
+    """
+    只根据目录中的统计筛选录制文件，无需打开数据
+
+    Parameters:
+        min_duration_s (float): 最短时长
+        min_presses (int): 最少按压次数 (channel 为 None 时为所有通道之和)
+        channel (int): 只看某个通道
+        min_peak (float): 该通道(或任一通道)最大值下限
+        metadata (dict): 元数据需要匹配的键值，如 {'port': '/dev/ttyACM0'}
+    :return: 匹配的目录条目列表
+    """
+    matches = []
+    for entry in catalog['files'].values():
+        stats = entry.get('stats')
+        if not stats or stats.get('frames', 0) == 0:
+            continue
+        if min_duration_s is not None and stats['duration_s'] < min_duration_s:
+            continue
+        presses = stats['press_count'] if channel is None else [stats['press_count'][channel]]
+        if min_presses is not None and sum(presses) < min_presses:
+            continue
+        peaks = stats['max'] if channel is None else [stats['max'][channel]]
+        if min_peak is not None and max(peaks) < min_peak:
+            continue
+        if metadata and any(entry['metadata'].get(k) != v for k, v in metadata.items()):
+            continue
+        matches.append(entry)
+    return matches
+
+
+def benchmarkBatch(n_files=24, minutes=5, channels=8, rate_hz=100, log_dir="/tmp/batch_bench"):
+    """生成若干 DataRecorder 格式的 CSV，比较 csv 模块逐个读取与进程池批处理的耗时"""
+    import csv
+    log_dir = Path(log_dir)
+    log_dir.mkdir(parents=True, exist_ok=True)
+    for p in list(log_dir.glob("*")) + list(log_dir.glob("archive/*")):
+        if p.is_file():
+            p.unlink()
+    n = int(minutes * 60 * rate_hz)
+    rng = np.random.default_rng(0)
+    t = np.arange(n) / rate_hz
+    for i in range(n_files):
+        press = np.clip(np.sin(2 * np.pi * 0.1 * t[:, None] + rng.uniform(0, 6, channels)), 0, None) ** 4 * 200
+        values = press + rng.normal(0, 2, (n, channels))
+        header = ",".join(["timestamp"] + [f"value_{c}" for c in range(channels)])
+        np.savetxt(log_dir / f"rec_{i:03d}.csv", np.column_stack([t, values]), delimiter=",",
+                   header=header, comments="", fmt=["%.6f"] + ["%.7g"] * channels)
+
+    t0 = time.perf_counter()
+    for path in sorted(log_dir.glob("*.csv")):
+        with open(path) as f:
+            rows = list(csv.reader(f))[1:]
+        np.array(rows, dtype=np.float64)
+    csv_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    build_catalog(log_dir, workers=1, force=True)
+    serial_s = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    catalog = build_catalog(log_dir, force=True)
+    pool_s = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    build_catalog(log_dir)
+    rerun_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    for path in sorted((log_dir / "archive").glob("*.tta")):
+        with ArchiveReader(path) as reader:
+            reader.read_all()
+    tta_read_s = time.perf_counter() - t0
+
+    csv_mb = sum(p.stat().st_size for p in log_dir.glob("*.csv")) / 1e6
+    tta_mb = sum(p.stat().st_size for p in (log_dir / "archive").glob("*.tta")) / 1e6
+    print(f"{n_files} files x {n} frames x {channels} ch, {csv_mb:.1f} MB csv -> {tta_mb:.1f} MB tta")
+    print(f"  csv module read only      : {csv_s:6.2f} s")
+    print(f"  convert + stats, 1 process: {serial_s:6.2f} s")
+    print(f"  convert + stats, pool({os.cpu_count()})  : {pool_s:6.2f} s")
+    print(f"  rerun (catalog up to date): {rerun_s:6.2f} s")
+    print(f"  read all converted .tta   : {tta_read_s:6.2f} s")
+    print(f"  query presses>=100        : {len(query_catalog(catalog, min_presses=100))} files")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="批量转换录制文件并生成统计目录")
+    parser.add_argument("log_dir", nargs="?", default="data_logs")
+    parser.add_argument("--out-dir", default=None, help="转换后的 .tta 目录 (默认 log_dir/archive)")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--codec", default="zlib", choices=["zlib", "lzma"])
+    parser.add_argument("--press-on", type=float, default=30.0)
+    parser.add_argument("--press-off", type=float, default=15.0)
+    parser.add_argument("--force", action="store_true", help="忽略目录缓存，全部重新处理")
+    args = parser.parse_args()
+    build_catalog(args.log_dir, args.out_dir, args.workers, args.codec,
+                  args.press_on, args.press_off, args.force)
+
+
+if __name__ == '__main__':
+    main()
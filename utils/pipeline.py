@@ -0,0 +1,186 @@
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from utils.rate_control import Pacer
+
+
+class SinkQueue:
+    POLICIES = ('latest', 'drop_oldest')
+
+    def __init__(self, policy='latest', maxlen=64):
+        """
+        单个 sink 的有界队列，生产者(读取线程)永不阻塞
+
+        Parameters:
+            policy (str): 'latest'      只保留最新的一个数据块
+                          'drop_oldest' 最多保留 maxlen 个块，满时丢弃最旧的
+            maxlen (int): drop_oldest 模式下的队列长度
+        """
+        if policy not in self.POLICIES:
+            raise ValueError(f"Unknown drop policy: {policy}")
+        self.policy = policy
+        self.queue = deque(maxlen=1 if policy == 'latest' else maxlen)
+        self.cond = threading.Condition()
+        self.dropped = 0  # 丢弃的帧数
+
+    def put(self, times_ns, block):
+        with self.cond:
+            if len(self.queue) == self.queue.maxlen:
+                self.dropped += len(self.queue[0][1])
+            self.queue.append((times_ns, block))
+            self.cond.notify()
+
+    def take(self, timeout=None):
+        """
+        取出队列中所有数据块并拼接为一个块
+
+        :return: (times_ns[n], block[n, channels])，无数据时返回 None
+        """
+        with self.cond:
+            if not self.queue and timeout:
+                self.cond.wait(timeout)
+            if not self.queue:
+                return None
+            items = list(self.queue)
+            self.queue.clear()
+        if len(items) == 1:
+            return items[0]
+        return (np.concatenate([t for t, _ in items]),
+                np.concatenate([b for _, b in items]))
+
+
+class Sink:
+    def __init__(self, name, consume, policy='latest', maxlen=64, threaded=False):
+        """
+        Parameters:
+            name (str): sink 名称
+            consume: 回调 consume(times_ns, block)
+            policy, maxlen: 见 SinkQueue
+            threaded (bool): True 在独立线程中消费；False 在主线程中消费
+                             (Open3D / Qt / pygame 窗口必须在主线程)
+        """
+        self.name = name
+        self.consume = consume
+        self.queue = SinkQueue(policy, maxlen)
+        self.threaded = threaded
+        self.delivered = 0  # 交给 consume 的帧数
+        self.thread = None
+
+    def step(self, timeout=None):
+        """消费一次队列，返回是否有数据"""
+        item = self.queue.take(timeout)
+        if item is None:
+            return False
+        times_ns, block = item
+        self.consume(times_ns, block)
+        self.delivered += len(block)
+        return True
+
+
+def latest_value(fn):
+    """把只接收单帧的回调 fn(values) 适配为 sink 回调"""
+    return lambda times_ns, block: fn(block[-1])
+
+
+class Pipeline:
+    def __init__(self, handler, poll_hz=1000):
+        """
+        单读取者扇出：一个线程独占 handler 读取串口，把解码后的帧块分发给多个 sink，
+        每个 sink 有自己的队列和丢弃策略，慢 sink 不会阻塞读取或其他 sink
+
+        Parameters:
+            handler: SerialDataHandler 实例
+            poll_hz (float): 串口轮询频率
+        """
+        self.handler = handler
+        self.poll_hz = poll_hz
+        self.sinks = []
+        self.running = False
+        self.recalibrate_flag = False
+        self.reconnect_flag = False
+        self.reader_thread = None
+        self._blocks = []
+
+    def add_sink(self, name, consume, policy='latest', maxlen=64, threaded=False):
+        sink = Sink(name, consume, policy, maxlen, threaded)
+        self.sinks.append(sink)
+        return sink
+
+    def request_recalibration(self):
+        """在读取线程中重新校准基线 (不重建 handler)"""
+        self.recalibrate_flag = True
+
+    def request_reconnect(self):
+        """在读取线程中重新打开串口 (保留基线和所有 sink)"""
+        self.reconnect_flag = True
+
+    def _on_block(self, times_ns, block):
+        self._blocks.append((times_ns, block))
+
+    def _reader_loop(self):
+        pacer = Pacer(self.poll_hz)
+        while self.running:
+            if self.recalibrate_flag:
+                self.handler.recalibrate()
+                self.recalibrate_flag = False
+            if self.reconnect_flag:
+                if self.handler.link is not None:
+                    self.handler.link.reconnect()
+                self.reconnect_flag = False
+
+            self.handler.poll()
+            if self._blocks:
+                if len(self._blocks) == 1:
+                    times_ns, block = self._blocks[0]
+                else:
+                    times_ns = np.concatenate([t for t, _ in self._blocks])
+                    block = np.concatenate([b for _, b in self._blocks])
+                self._blocks = []
+                for sink in self.sinks:
+                    sink.queue.put(times_ns, block)
+            pacer.wait()
+
+    def _worker_loop(self, sink):
+        while self.running:
+            sink.step(timeout=0.1)
+
+    def start(self):
+        self.running = True
+        self.handler.add_block_sink(self._on_block)
+        self.reader_thread = threading.Thread(target=self._reader_loop, daemon=True)
+        self.reader_thread.start()
+        for sink in self.sinks:
+            if sink.threaded:
+                sink.thread = threading.Thread(target=self._worker_loop, args=(sink,), daemon=True)
+                sink.thread.start()
+
+    def run(self, should_stop=lambda: False, idle_sleep=0.002):
+        """启动并在主线程中轮流驱动非线程 sink，直到 should_stop() 返回 True"""
+        self.start()
+        main_sinks = [s for s in self.sinks if not s.threaded]
+        try:
+            while not should_stop():
+                busy = False
+                for sink in main_sinks:
+                    busy |= sink.step()
+                if not busy:
+                    time.sleep(idle_sleep)
+        finally:
+            self.stop()
+
+    def stop(self):
+        self.running = False
+        if self.reader_thread is not None:
+            self.reader_thread.join()
+        for sink in self.sinks:
+            if sink.thread is not None:
+                sink.thread.join()
+        self.handler.remove_block_sink(self._on_block)
+
+    def get_stats(self):
+        """各 sink 的交付/丢弃帧数"""
+        return {s.name: {'delivered': s.delivered, 'dropped': s.queue.dropped}
+                for s in self.sinks}
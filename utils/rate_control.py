@@ -0,0 +1,194 @@
+import time
+from collections import deque
+
+import numpy as np
+
+
+class RateEstimator:
+    def __init__(self, alpha=0.05):
+        """
+        在线估计帧率与抖动 (指数滑动平均)
+
+        Parameters:
+            alpha (float): 单帧的平滑系数，越小越平稳
+        """
+        self.alpha = alpha
+        self.last_t = None
+        self.mean_dt = None  # 平均帧间隔(s)
+        self.var_dt = 0.0    # 帧间隔方差(s^2)
+        self.frame_count = 0
+
+    def update(self, t, n=1):
+        """
+        记录一批到达的帧
+
+        :param t: 本批次到达时间(s, 单调时钟)
+        :param n: 本批次包含的帧数
+        """
+        if n <= 0:
+            return
+        self.frame_count += n
+        if self.last_t is None:
+            self.last_t = t
+            return
+
+        dt = (t - self.last_t) / n
+        self.last_t = t
+        if self.mean_dt is None:
+            self.mean_dt = dt
+            return
+
+        # 一批 n 帧等价于 n 次单帧更新
+        a = 1.0 - (1.0 - self.alpha) ** n
+        err = dt - self.mean_dt
+        self.mean_dt += a * err
+        self.var_dt = (1.0 - a) * (self.var_dt + a * err * err)
+
+    @property
+    def rate_hz(self):
+        """估计的帧率(Hz)，数据不足时为 0"""
+        if not self.mean_dt or self.mean_dt <= 0:
+            return 0.0
+        return 1.0 / self.mean_dt
+
+    @property
+    def jitter_s(self):
+        """估计的帧间隔抖动(标准差, s)"""
+        return float(np.sqrt(self.var_dt))
+
+    def mark_gap(self):
+        """数据流中断(如串口重连)后调用：下一批只作为新的起点，中断时长不计入帧间隔"""
+        self.last_t = None
+
+    def reset(self):
+        self.last_t = None
+        self.mean_dt = None
+        self.var_dt = 0.0
+        self.frame_count = 0
+
+
+class Pacer:
+    def __init__(self, rate_hz, spin_margin=0.0005):
+        """
+        基于截止时间的自适应等待：大部分时间 sleep，只在最后不足
+        一次 sleep 误差的时间内让出CPU，不累积漂移
+
+        Parameters:
+            rate_hz (float): 目标频率
+            spin_margin (float): sleep 误差的初始估计(s)
+        """
+        self.period = 1.0 / rate_hz
+        self.next_t = None
+        self.oversleep = spin_margin  # sleep 超时量的滑动估计
+
+    def set_rate(self, rate_hz):
+        self.period = 1.0 / rate_hz
+
+    def wait(self):
+        """等待到下一个节拍，返回节拍时刻(s, 单调时钟)"""
+        now = time.monotonic()
+        if self.next_t is None:
+            self.next_t = now + self.period
+            return now
+
+        remaining = self.next_t - now
+        if remaining > self.oversleep:
+            request = remaining - self.oversleep
+            time.sleep(request)
+            actual = time.monotonic() - now
+            self.oversleep = 0.9 * self.oversleep + 0.1 * max(actual - request, 0.0)
+        while time.monotonic() < self.next_t:
+            time.sleep(0)
+
+        tick = self.next_t
+        self.next_t += self.period
+        now = time.monotonic()
+        if now - tick > self.period:
+            # 落后超过一个周期：丢弃错过的节拍，重新对齐
+            tick = now
+            self.next_t = now + self.period
+        return tick
+
+
+class RateController:
+    MODES = ('hold', 'decimate', 'interp')
+
+    def __init__(self, handler, rate_hz, mode='hold', history=256):
+        """
+        按指定频率向下游输出帧
+
+        Parameters:
+            handler: SerialDataHandler 实例
+            rate_hz (float): 输出频率
+            mode (str): 'hold'     输出最新帧(零阶保持)
+                        'decimate' 输出两个节拍间所有帧的均值(抽取+抗混叠)
+                        'interp'   在相邻两帧间线性插值(延迟一个输入周期)
+            history (int): 内部缓存的最大帧数
+        """
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown rate mode: {mode}")
+        self.handler = handler
+        self.rate_hz = rate_hz
+        self.mode = mode
+
+        self.pacer = Pacer(rate_hz)
+        self.output_estimator = RateEstimator()
+        self.frames = deque(maxlen=history)  # (t, values)
+        self.last_output = handler.latest_data.copy()
+
+        handler.add_frame_sink(self._on_frame)
+
+    def _on_frame(self, t_ns, values):
+        self.frames.append((t_ns * 1e-9, values))
+
+    @property
+    def input_rate_hz(self):
+        """实测的输入帧率"""
+        return self.handler.rate_estimator.rate_hz
+
+    @property
+    def output_rate_hz(self):
+        """实测的输出帧率(下游处理慢时会低于目标值)"""
+        return self.output_estimator.rate_hz or self.rate_hz
+
+    def read(self):
+        """阻塞到下一个节拍，返回该节拍对应的一帧"""
+        tick = self.pacer.wait()
+        self.handler.poll()
+        self.output_estimator.update(tick)
+
+        if self.mode == 'interp':
+            value = self._interpolate(tick)
+        elif self.frames:
+            if self.mode == 'decimate':
+                value = np.mean([v for _, v in self.frames], axis=0)
+            else:
+                value = self.frames[-1][1]
+            self.frames.clear()
+        else:
+            value = self.last_output
+
+        self.last_output = value
+        return value.copy()
+
+    def _interpolate(self, tick):
+        if not self.frames:
+            return self.last_output
+        if len(self.frames) == 1:
+            return self.frames[-1][1]
+
+        # 落后一个输入周期插值，避免外推
+        delay = self.handler.rate_estimator.mean_dt or 0.0
+        t = tick - delay
+        while len(self.frames) > 2 and self.frames[1][0] <= t:
+            self.frames.popleft()
+        (t0, v0), (t1, v1) = self.frames[0], self.frames[1]
+        if t <= t0 or t1 <= t0:
+            return v0
+        if t >= t1:
+            return v1
+        w = (t - t0) / (t1 - t0)
+        return v0 + w * (v1 - v0)
+
+    def close(self):
+        self.handler.remove_frame_sink(self._on_frame)
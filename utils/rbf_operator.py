@@ -0,0 +1,49 @@
+import numpy as np
+
+# 与 scipy.interpolate.Rbf 相同的核函数定义
+RBF_KERNELS = {
+    'gaussian': lambda r, eps: np.exp(-(r / eps) ** 2),
+    'multiquadric': lambda r, eps: np.sqrt((r / eps) ** 2 + 1),
+    'inverse': lambda r, eps: 1.0 / np.sqrt((r / eps) ** 2 + 1),
+    'linear': lambda r, eps: r,
+    'cubic': lambda r, eps: r ** 3,
+    'quintic': lambda r, eps: r ** 5,
+}
+
+
+def rbf_epsilon(sensor_xy):
+    """scipy Rbf 的默认 epsilon：按节点包围盒估计的平均间距"""
+    sensor_xy = np.asarray(sensor_xy, dtype=np.float64)
+    edges = np.ptp(sensor_xy, axis=0)
+    edges = edges[np.nonzero(edges)]
+    return np.power(np.prod(edges) / len(sensor_xy), 1.0 / edges.size)
+
+
+def rbf_operator(sensor_xy, query_xy, function='gaussian', epsilon=None, dtype=np.float32):
+    """
+    预计算 RBF 插值的线性算子
+
+    传感器位置固定时，Rbf 插值对传感器数值是线性的：
+        f(query) = Phi(query, sensor) @ A^-1 @ values
+    因此可以在加载时算出 W = Phi @ A^-1 (Q x N)，每帧只需一次 W @ values，
+    结果与 scipy.interpolate.Rbf(..., function=function) 一致。
+
+    :param sensor_xy: (N, 2) 传感器平面坐标
+    :param query_xy: (Q, 2) 插值点平面坐标
+    :param function: 核函数名称，见 RBF_KERNELS
+    :param epsilon: 核宽度，None 时与 scipy 默认值相同
+    :return: (Q, N) 插值矩阵
+    """
+    kernel = RBF_KERNELS[function]
+    sensor_xy = np.asarray(sensor_xy, dtype=np.float64)
+    query_xy = np.asarray(query_xy, dtype=np.float64)
+    if epsilon is None:
+        epsilon = rbf_epsilon(sensor_xy)
+
+    r_ss = np.linalg.norm(sensor_xy[:, None, :] - sensor_xy[None, :, :], axis=-1)
+    r_qs = np.linalg.norm(query_xy[:, None, :] - sensor_xy[None, :, :], axis=-1)
+    A = kernel(r_ss, epsilon)
+    phi = kernel(r_qs, epsilon)
+    # W = phi @ inv(A)，用 solve 代替求逆
+    W = np.linalg.solve(A.T, phi.T).T
+    return W.astype(dtype)
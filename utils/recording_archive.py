@@ -0,0 +1,391 @@
+"""
+录制归档格式 (.tta)
+
+    文件头   b'TTAR' | version u8 | 元数据长度 u32 | 元数据 JSON
+    数据块   块头 CHUNK_HEADER | 压缩数据 (时间戳增量 + 数值增量，按字节重排)
+    ...
+    索引     每块一行 int64 (t_first_ns, t_last_ns, offset, first_frame, n_rows)
+    文件尾   索引偏移 u64 | 块数 u32 | b'TTIX'
+
+每块固定 chunk_rows 帧 (最后一块除外)，块内独立压缩，因此按帧号或时间窗读取只需
+在内存索引中定位后 seek 到对应块解压。文件尾缺失 (录制中断) 时按块头顺序扫描重建索引。
+"""
+
+import json
+import lzma
+import os
+import struct
+import time
+import zlib
+from datetime import datetime
+
+import numpy as np
+
+MAGIC = b'TTAR'
+VERSION = 1
+INDEX_MAGIC = b'TTIX'
+CHUNK_MAGIC = b'CK'
+FILE_HEADER = struct.Struct('<4sBI')
+CHUNK_HEADER = struct.Struct('<2sHIqqII')  # magic, codec, n_rows, t_first, t_last, payload 长度, crc32
+FOOTER = struct.Struct('<QI4s')
+INDEX_COLUMNS = ('t_first_ns', 't_last_ns', 'offset', 'first_frame', 'n_rows')
+
+CODECS = {
+    'none': (0, lambda b, level: b, lambda b: b),
+    'zlib': (1, lambda b, level: zlib.compress(b, 6 if level is None else level), zlib.decompress),
+    'lzma': (2, lambda b, level: lzma.compress(b, preset=1 if level is None else level), lzma.decompress),
+}
+CODEC_NAMES = {code: name for name, (code, _, _) in CODECS.items()}
+
+
+def _shuffle(a):
+    """按字节平面重排 (每个数的第 k 个字节放在一起)，增量后的高位字节几乎全为 0，压缩率更高"""
+    a = np.ascontiguousarray(a)
+    return a.view(np.uint8).reshape(-1, a.dtype.itemsize).T.tobytes()
+
+
+def _unshuffle(buf, dtype, count):
+    dtype = np.dtype(dtype)
+    planes = np.frombuffer(buf, dtype=np.uint8, count=count * dtype.itemsize)
+    return planes.reshape(dtype.itemsize, count).T.copy().view(dtype).ravel()
+
+
+def _bits_dtype(dtype):
+    """浮点数按位异或增量使用的无符号整数类型"""
+    return np.dtype(f'u{np.dtype(dtype).itemsize}')
+
+
+def encode_chunk(times_ns, values):
+    """
+    增量编码一块数据 (无损)
+
+    时间戳: 相邻差值 (int64)
+    整数值: 沿时间轴的相邻差值 (同类型回绕运算，可精确还原)
+    浮点值: 与上一帧按位异或 (Gorilla 式，缓慢变化时高位为 0)
+    数值按通道连续存放后再按字节重排
+    """
+    times_ns = np.asarray(times_ns, dtype=np.int64)
+    dt = np.empty_like(times_ns)
+    dt[0] = 0
+    np.subtract(times_ns[1:], times_ns[:-1], out=dt[1:])
+
+    if values.dtype.kind == 'f':
+        bits = values.view(_bits_dtype(values.dtype))
+        dv = bits.copy()
+        np.bitwise_xor(bits[1:], bits[:-1], out=dv[1:])
+    else:
+        dv = values.copy()
+        np.subtract(values[1:], values[:-1], out=dv[1:])
+    return _shuffle(dt) + _shuffle(dv.T)
+
+
+def decode_chunk(payload, t_first, n_rows, channels, dtype):
+    """encode_chunk 的逆运算，返回 (times_ns[n], values[n, channels])"""
+    dtype = np.dtype(dtype)
+    split = n_rows * 8
+    times_ns = np.cumsum(_unshuffle(payload[:split], np.int64, n_rows)) + t_first
+    if dtype.kind == 'f':
+        dv = _unshuffle(payload[split:], _bits_dtype(dtype), n_rows * channels).reshape(channels, n_rows).T
+        values = np.bitwise_xor.accumulate(dv, axis=0).view(dtype)
+    else:
+        dv = _unshuffle(payload[split:], dtype, n_rows * channels).reshape(channels, n_rows).T
+        values = np.cumsum(dv, axis=0, dtype=dtype)
+    return times_ns, values
+
+
+def _to_json(value):
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Cannot serialize {type(value)}")
+
+
+class ArchiveWriter:
+    def __init__(self, path, channels, dtype='float32', chunk_rows=4096, codec='zlib',
+                 level=None, metadata=None):
+        """
+        流式写入录制归档：数据攒满 chunk_rows 帧即压缩写盘，内存占用固定
+
+        Parameters:
+            path (str): 输出文件 (.tta)
+            channels (int): 通道数
+            dtype (str): 数值类型，原始计数用 int16/int32，校准值用 float32
+            chunk_rows (int): 每块帧数
+            codec (str): 'zlib' (默认，快) / 'lzma' (更小，较慢) / 'none'
+            level: 压缩级别，None 使用 codec 的默认值
+            metadata (dict): 附加元数据，如 port、baseline、rate_hz、layout (行列数或传感器坐标)
+        """
+        if codec not in CODECS:
+            raise ValueError(f"Unknown codec: {codec}")
+        self.path = str(path)
+        self.channels = channels
+        self.dtype = np.dtype(dtype)
+        self.chunk_rows = chunk_rows
+        self.codec = codec
+        self.level = level
+        self.codec_id, self._compress, _ = CODECS[codec]
+
+        self.metadata = dict(metadata or {})
+        self.metadata.update({
+            'channels': channels,
+            'dtype': self.dtype.str,
+            'chunk_rows': chunk_rows,
+            'codec': codec,
+            'created': datetime.now().isoformat(timespec='seconds'),
+        })
+        self.index = []
+        self.n_frames = 0
+        self.bytes_in = 0  # 未压缩的数据字节数
+
+        # 待写入的帧
+        self._times = np.empty(chunk_rows, dtype=np.int64)
+        self._values = np.empty((chunk_rows, channels), dtype=self.dtype)
+        self._pending = 0
+
+        self.file = open(self.path, 'wb')
+        header = json.dumps(self.metadata, default=_to_json).encode()
+        self.file.write(FILE_HEADER.pack(MAGIC, VERSION, len(header)))
+        self.file.write(header)
+
+    def write(self, times_ns, values):
+        """
+        追加若干帧
+
+        :param times_ns: (n,) int64 纳秒时间戳 (单调递增)
+        :param values: (n, channels) 数值
+        """
+        times_ns = np.asarray(times_ns, dtype=np.int64).reshape(-1)
+        values = np.asarray(values).reshape(len(times_ns), self.channels)
+        i = 0
+        while i < len(times_ns):
+            take = min(self.chunk_rows - self._pending, len(times_ns) - i)
+            self._times[self._pending:self._pending + take] = times_ns[i:i + take]
+            self._values[self._pending:self._pending + take] = values[i:i + take]
+            self._pending += take
+            i += take
+            if self._pending == self.chunk_rows:
+                self._write_chunk()
+
+    def _write_chunk(self):
+        n = self._pending
+        if n == 0:
+            return
+        times_ns, values = self._times[:n], self._values[:n]
+        raw = encode_chunk(times_ns, values)
+        payload = self._compress(raw, self.level)
+        offset = self.file.tell()
+        self.file.write(CHUNK_HEADER.pack(CHUNK_MAGIC, self.codec_id, n, int(times_ns[0]), int(times_ns[-1]),
+                                          len(payload), zlib.crc32(payload)))
+        self.file.write(payload)
+        self.index.append((int(times_ns[0]), int(times_ns[-1]), offset, self.n_frames, n))
+        self.n_frames += n
+        self.bytes_in += times_ns.nbytes + values.nbytes
+        self._pending = 0
+
+    def flush(self):
+        """把未满的一块写盘 (之后的数据从新块开始)"""
+        self._write_chunk()
+        self.file.flush()
+
+    def close(self):
+        if self.file.closed:
+            return
+        self._write_chunk()
+        index_offset = self.file.tell()
+        self.file.write(np.array(self.index, dtype='<i8').reshape(-1, len(INDEX_COLUMNS)).tobytes())
+        self.file.write(FOOTER.pack(index_offset, len(self.index), INDEX_MAGIC))
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ArchiveReader:
+    def __init__(self, path):
+        """
+        读取录制归档。打开时只读文件头和块索引，数据按需解压
+
+        Attributes:
+            metadata (dict): 写入时的元数据
+            index: (n_chunks, 5) int64，列见 INDEX_COLUMNS
+            n_frames (int): 总帧数
+        """
+        self.path = str(path)
+        self.file = open(self.path, 'rb')
+        magic, version, header_len = FILE_HEADER.unpack(self.file.read(FILE_HEADER.size))
+        if magic != MAGIC:
+            raise ValueError(f"Not a recording archive: {self.path}")
+        if version > VERSION:
+            raise ValueError(f"Unsupported archive version: {version}")
+        self.metadata = json.loads(self.file.read(header_len))
+        self.data_offset = FILE_HEADER.size + header_len
+        self.channels = self.metadata['channels']
+        self.dtype = np.dtype(self.metadata['dtype'])
+        self.complete = True
+        self.index = self._load_index()
+        self.n_frames = int(self.index[:, 4].sum()) if len(self.index) else 0
+
+    def _load_index(self):
+        size = os.path.getsize(self.path)
+        if size >= self.data_offset + FOOTER.size:
+            self.file.seek(size - FOOTER.size)
+            index_offset, n_chunks, magic = FOOTER.unpack(self.file.read(FOOTER.size))
+            if magic == INDEX_MAGIC:
+                self.file.seek(index_offset)
+                buf = self.file.read(n_chunks * 8 * len(INDEX_COLUMNS))
+                return np.frombuffer(buf, dtype='<i8').reshape(n_chunks, len(INDEX_COLUMNS))
+        # 没有文件尾：录制未正常结束，顺序扫描块头
+        self.complete = False
+        return self._scan_index(size)
+
+    def _scan_index(self, size):
+        index = []
+        offset, first_frame = self.data_offset, 0
+        while offset + CHUNK_HEADER.size <= size:
+            self.file.seek(offset)
+            magic, _, n_rows, t_first, t_last, length, _ = CHUNK_HEADER.unpack(self.file.read(CHUNK_HEADER.size))
+            if magic != CHUNK_MAGIC or offset + CHUNK_HEADER.size + length > size:
+                break  # 最后一块未写完
+            index.append((t_first, t_last, offset, first_frame, n_rows))
+            first_frame += n_rows
+            offset += CHUNK_HEADER.size + length
+        return np.array(index, dtype=np.int64).reshape(-1, len(INDEX_COLUMNS))
+
+    def read_chunk(self, i):
+        """解压第 i 块，返回 (times_ns, values)"""
+        self.file.seek(int(self.index[i, 2]))
+        magic, codec_id, n_rows, t_first, _, length, crc = CHUNK_HEADER.unpack(self.file.read(CHUNK_HEADER.size))
+        payload = self.file.read(length)
+        if magic != CHUNK_MAGIC or zlib.crc32(payload) != crc:
+            raise ValueError(f"Corrupt chunk {i} in {self.path}")
+        raw = CODECS[CODEC_NAMES[codec_id]][2](payload)
+        return decode_chunk(raw, t_first, n_rows, self.channels, self.dtype)
+
+    def iter_chunks(self, start=0, stop=None):
+        """按顺序逐块读取 (流式处理，内存占用为一块)"""
+        for i in range(start, len(self.index) if stop is None else stop):
+            yield self.read_chunk(i)
+
+    def _concat(self, chunks):
+        if not chunks:
+            return np.empty(0, dtype=np.int64), np.empty((0, self.channels), dtype=self.dtype)
+        return np.concatenate([t for t, _ in chunks]), np.concatenate([v for _, v in chunks])
+
+    def read_frames(self, start, stop):
+        """按帧号读取 [start, stop)，只解压覆盖的块"""
+        first = self.index[:, 3]
+        lo = max(np.searchsorted(first, start, side='right') - 1, 0)
+        hi = np.searchsorted(first, stop, side='left')
+        times_ns, values = self._concat(list(self.iter_chunks(lo, hi)))
+        offset = int(first[lo]) if len(first) else 0
+        return times_ns[start - offset:stop - offset], values[start - offset:stop - offset]
+
+    def read_range(self, t_start_ns, t_end_ns):
+        """按时间窗读取 [t_start_ns, t_end_ns)，只解压覆盖的块"""
+        lo = np.searchsorted(self.index[:, 1], t_start_ns, side='left')
+        hi = np.searchsorted(self.index[:, 0], t_end_ns, side='left')
+        times_ns, values = self._concat(list(self.iter_chunks(lo, hi)))
+        keep = slice(np.searchsorted(times_ns, t_start_ns, side='left'),
+                     np.searchsorted(times_ns, t_end_ns, side='left'))
+        return times_ns[keep], values[keep]
+
+    def read_all(self):
+        return self._concat(list(self.iter_chunks()))
+
+    @property
+    def time_range_ns(self):
+        if len(self.index) == 0:
+            return None
+        return int(self.index[0, 0]), int(self.index[-1, 1])
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def archive_to_csv(archive_path, csv_path=None):
+    """把归档导出为与 DataRecorder 相同格式的 CSV (时间戳为相对秒)"""
+    csv_path = csv_path or os.path.splitext(archive_path)[0] + ".csv"
+    with ArchiveReader(archive_path) as reader, open(csv_path, 'w') as f:
+        header = ",".join(["timestamp"] + [f"value_{i}" for i in range(reader.channels)])
+        f.write(header + "\n")
+        t0 = reader.time_range_ns[0] if reader.n_frames else 0
+        value_fmt = "%d" if reader.dtype.kind in 'iu' else ("%.9g" if reader.dtype.itemsize <= 4 else "%.17g")
+        fmt = ["%.6f"] + [value_fmt] * reader.channels
+        for times_ns, values in reader.iter_chunks():
+            np.savetxt(f, np.column_stack([(times_ns - t0) * 1e-9, values]), delimiter=",", fmt=fmt)
+    return csv_path
+
+
+def _synthetic_recording(n_frames, channels, rate_hz, dtype):
+    """模拟触觉信号：缓慢漂移的基线 + 偶尔按压 + 噪声"""
+    rng = np.random.default_rng(0)
+    t = np.arange(n_frames) / rate_hz
+    times_ns = (t * 1e9).astype(np.int64) + rng.integers(0, 20000, n_frames)
+    times_ns.sort()
+    press = np.clip(np.sin(2 * np.pi * 0.05 * t[:, None] + np.arange(channels)), 0, None) ** 4 * 3000
+    values = 2000 + press + rng.normal(0, 3, (n_frames, channels))
+    return times_ns, values.astype(dtype)
+
+
+def benchmarkArchive(minutes=30, channels=8, rate_hz=100, out_dir="/tmp/tta_bench"):
+    """比较 CSV 与归档格式的文件大小、写入/读取速度和时间窗随机读取"""
+    os.makedirs(out_dir, exist_ok=True)
+    n_frames = int(minutes * 60 * rate_hz)
+    for dtype in ('int32', 'float32'):
+        times_ns, values = _synthetic_recording(n_frames, channels, rate_hz, dtype)
+        times_s = (times_ns - times_ns[0]) * 1e-9
+
+        csv_path = os.path.join(out_dir, f"bench_{dtype}.csv")
+        t0 = time.perf_counter()
+        fmt = ["%.6f"] + (["%d"] if dtype == 'int32' else ["%.9g"]) * channels
+        np.savetxt(csv_path, np.column_stack([times_s, values]), delimiter=",", fmt=fmt)
+        csv_write = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        np.loadtxt(csv_path, delimiter=",")
+        csv_read = time.perf_counter() - t0
+        csv_size = os.path.getsize(csv_path)
+        print(f"[{dtype}] {n_frames} frames x {channels} ch ({minutes} min @ {rate_hz} Hz)")
+        print(f"  csv        : {csv_size / 1e6:7.2f} MB  write {csv_write * 1e3:7.1f} ms  read {csv_read * 1e3:7.1f} ms")
+
+        for codec in ('zlib', 'lzma'):
+            path = os.path.join(out_dir, f"bench_{dtype}_{codec}.tta")
+            t0 = time.perf_counter()
+            with ArchiveWriter(path, channels, dtype, codec=codec,
+                               metadata={'port': 'synthetic', 'rate_hz': rate_hz}) as writer:
+                for i in range(0, n_frames, 1000):  # 模拟流式写入
+                    writer.write(times_ns[i:i + 1000], values[i:i + 1000])
+            write_s = time.perf_counter() - t0
+
+            t0 = time.perf_counter()
+            with ArchiveReader(path) as reader:
+                t_read, v_read = reader.read_all()
+            read_s = time.perf_counter() - t0
+            assert np.array_equal(t_read, times_ns) and np.array_equal(v_read, values)
+
+            # 随机 1 秒时间窗
+            rng = np.random.default_rng(1)
+            starts = rng.integers(times_ns[0], times_ns[-1] - 10 ** 9, 100)
+            with ArchiveReader(path) as reader:
+                t0 = time.perf_counter()
+                for s in starts:
+                    reader.read_range(s, s + 10 ** 9)
+                seek_ms = (time.perf_counter() - t0) / len(starts) * 1e3
+
+            size = os.path.getsize(path)
+            print(f"  tta/{codec:5}: {size / 1e6:7.2f} MB  write {write_s * 1e3:7.1f} ms  read {read_s * 1e3:7.1f} ms"
+                  f"  1s-window {seek_ms:.2f} ms  ({csv_size / size:.1f}x smaller, "
+                  f"{values.nbytes / size:.1f}x vs raw values)")
+
+
+if __name__ == '__main__':
+    benchmarkArchive()
@@ -1,21 +1,37 @@
-import serial
 import numpy as np
 from collections import deque
-from datetime import datetime, timedelta
 import os
 import pickle
+import time
+from utils.rate_control import RateEstimator
+from utils.clock_sync import ClockModel
+from utils.serial_link import SerialLink
+from utils.dtype_policy import DEFAULT_DTYPES
+from utils.ascii_parser import take_complete_lines, parse_ascii_lines, match_lines
 SENSOR_PORTS = ['/dev/ttyACM0', ]
-# 需要写一个频率控制的算法
+# 频率控制见 utils/rate_control.py: 本类在线估计输入帧率, RateController 按目标频率输出
 class SerialDataHandler:
     def __init__(self, port="", baud_rate=115200, num_sensors=8, 
                  sensor_id=0, store_path=None, calibration_frames=100,
-                 simulate=False, sim_max_value=10000):
+                 simulate=False, sim_max_value=10000,
+                 device_counter=False, counter_hz=1000.0, counter_bits=32,
+                 dtypes=None):
         '''
         openteach单进程特制的串口读取程序
         
         Parameters:
             simulate: bool, 是否使用仿真模式
             sim_max_value: float, 仿真模式下数据的最大值
+            port: str, 串口路径。断线后自动重连 (见 utils/serial_link.py)，基线和订阅者保持不变
+            device_counter: bool, 每行第一个数是否为固件的计数器/序号
+            counter_hz: float, 设备计数器频率 (序号时等于采样率)
+            counter_bits: int, 设备计数器位宽 (用于回绕展开)
+            dtypes: DtypePolicy, 原始数值/校准值的数据类型，默认 float32 / float32。
+                    原始类型为整数时，含小数或超出取值范围的行被拒收 (计入 rejected_lines)
+
+        时间戳均为 time.monotonic_ns() 时基下的整数纳秒。
+        有设备计数器时用 ClockModel 把设备时间映射到主机时钟，否则按估计帧周期
+        从批次到达时刻回填。
         '''
         self.sensor_id = sensor_id
         self.serial_port = port
@@ -25,24 +41,44 @@ class SerialDataHandler:
         self.calibration_frames = calibration_frames
         self.simulate = simulate
         self.sim_max_value = sim_max_value
+        self.device_counter = device_counter
+        self.counter_hz = counter_hz
+        self.dtypes = dtypes or DEFAULT_DTYPES
         
         # 数据存储
-        self.latest_data = np.zeros(num_sensors)  # 最新有效数据
+        self.latest_data = np.zeros(num_sensors, dtype=self.dtypes.value)  # 最新有效数据
         self.data_buffer = deque()  # 改为队列提高性能
         self.raw_buffer = bytearray()  # 原始字节缓冲区
+
+        # 帧率估计与下游订阅
+        self.rate_estimator = RateEstimator()
+        self.frame_sinks = []  # 回调 sink(t_ns, values)
+        self.block_sinks = []  # 回调 sink(times_ns, block)，每批次调用一次
+        self._new_frames = []  # 本次读取中新解析出的帧块 (counters, raw_block, value_block)
+        self.bad_lines = 0  # 丢弃的行数 (格式错误或空行)
+        self.rejected_lines = 0  # 数值无法无损存为整数原始类型而丢弃的行数
+        self.latest_time_ns = 0  # 最新帧的时间戳
+
+        # 设备时钟对齐
+        self.clock_model = ClockModel(counter_hz, counter_bits) if device_counter else None
+        self.counter_bits = counter_bits
+        self.link_generation = 0  # 已处理的串口连接代数，变化时重新对齐
         
         # 校准相关
         self.calibration_values = []  # 校准数据存储
-        self.baseline = np.zeros(num_sensors)  # 校准基准值
+        self.baseline = np.zeros(num_sensors, dtype=self.dtypes.value)  # 校准基准值
         self.calibration_done = False  # 校准完成标志
         
         if not self.simulate:
             # 连接真实串口
-            self.ser = serial.Serial(port, baud_rate, timeout=0)  # 非阻塞模式
-            print(f"Connected to {port} at {baud_rate} baud")
+            self.link = SerialLink(port, baud_rate)  # 非阻塞模式
+            self.ser = self.link
+            self.link_generation = self.link.generation
+            print(f"Connected to {self.link.stable_port} at {baud_rate} baud")
             self.perform_calibration()
         else:
             # 仿真模式不需要实际串口连接
+            self.link = None
             self.ser = None
             print(f"Running in simulation mode with {num_sensors} sensors, max value {sim_max_value}")
         
@@ -50,8 +86,15 @@ class SerialDataHandler:
         
     
     def perform_calibration(self):
-        """执行传感器校准"""
+        """
+        执行传感器校准 (启动时以及运行中按需重新校准共用)
+
+        开始前先取走串口中已积压的数据并清空帧缓冲区，基线只由校准开始后解析出的帧计算，
+        不会混入之前 (例如按压期间) 的旧帧
+        """
         print(f"Starting calibration for sensor {self.sensor_id}...")
+        self._discard_stale_frames()
+        self.calibration_values = []
         collected_frames = 0
         
         while collected_frames < self.calibration_frames:
@@ -70,7 +113,7 @@ class SerialDataHandler:
         
         # 计算基准值
         if self.calibration_values:
-            self.baseline = np.mean(self.calibration_values, axis=0)
+            self.baseline = np.mean(self.calibration_values, axis=0).astype(self.dtypes.value)
             print(f"Calibration completed for sensor {self.sensor_id}. Baseline: {self.baseline.tolist()}")
         else:
             print(f"Warning: No calibration data collected for sensor {self.sensor_id}")
@@ -79,12 +122,39 @@ class SerialDataHandler:
         self.calibration_values = []  # 释放内存
         self.data_buffer.clear()  # 清空临时缓冲区
 
+    def recalibrate(self):
+        """
+        运行中重新校准基线 (不重建 handler)：校准期间暂停所有订阅者，
+        避免按旧基线校准的帧被显示或录制
+        """
+        frame_sinks, block_sinks = self.frame_sinks, self.block_sinks
+        self.frame_sinks, self.block_sinks = [], []
+        try:
+            self.perform_calibration()
+        finally:
+            self.frame_sinks, self.block_sinks = frame_sinks, block_sinks
+
+    def _discard_stale_frames(self):
+        """
+        解析所有已到达的字节后清空帧缓冲区。未结束的半行 (矩阵为半帧) 保留以维持对齐，
+        它最多早于调用时刻一帧
+        """
+        self._read_and_process()
+        self.data_buffer.clear()
+
     def _generate_simulated_data(self):
         """生成模拟数据"""
         # 生成随机数据，范围在0到sim_max_value之间
-        simulated_values = np.random.uniform(0, self.sim_max_value, self.num_sensors)
-        # 将数据格式化为字符串，模拟真实串口输出
-        data_str = ' '.join([f"{val:.2f}" for val in simulated_values]) + '\n'
+        # 将数据格式化为字符串，模拟真实串口输出 (整数原始类型时输出整数计数)
+        if self.dtypes.raw_is_int:
+            simulated_values = np.random.randint(0, self.sim_max_value, self.num_sensors)
+            data_str = ' '.join([f"{val}" for val in simulated_values]) + '\n'
+        else:
+            simulated_values = np.random.uniform(0, self.sim_max_value, self.num_sensors)
+            data_str = ' '.join([f"{val:.2f}" for val in simulated_values]) + '\n'
+        if self.device_counter:
+            counter = int(time.monotonic() * self.counter_hz) % (1 << 32)
+            data_str = f"{counter} " + data_str
         return data_str.encode('utf-8')
 
     def _read_and_process(self):
@@ -95,36 +165,154 @@ class SerialDataHandler:
             data = self._generate_simulated_data()
         else:
             # 非阻塞读取所有可用字节
-            data = self.ser.read(self.ser.in_waiting or 1)
+            data = self._read_link()
+        t_arrival_ns = time.monotonic_ns()
         
         if data:
             self.raw_buffer.extend(data)
         
-        # 2. 分割完整数据帧
-        while b'\n' in self.raw_buffer:
-            idx = self.raw_buffer.index(b'\n')
-            line_bytes = self.raw_buffer[:idx]
-            del self.raw_buffer[:idx+1]  # 移除已处理部分
-            
-            # 3. 高效解析（跳过空行）
-            if line_bytes:
-                try:
-                    line = line_bytes.decode().strip()
-                    values = [float(val) for val in line.split()]
-                    if len(values) == self.num_sensors:
-                        timestamp = datetime.now()
-                        raw_values = np.array(values)
-                        
-                        # 添加到数据缓冲区
-                        self.data_buffer.append((timestamp, raw_values))
-                        
-                        # 更新最新数据
-                        if self.calibration_done:
-                            self.latest_data = raw_values - self.baseline
-                        else:
-                            self.latest_data = raw_values
-                except (UnicodeDecodeError, ValueError):
-                    pass
+        # 2. 一次取出所有完整行并批量解析
+        chunk = take_complete_lines(self.raw_buffer)
+        if chunk is not None:
+            n_cols = self.num_sensors + 1 if self.device_counter else self.num_sensors
+            block, valid = parse_ascii_lines(chunk, n_cols)
+            self.bad_lines += int(np.count_nonzero(~valid))
+            if len(block):
+                counters = None
+                if self.device_counter:
+                    counters, block = block[:, 0], block[:, 1:]
+                fits = self._check_raw(block)
+                if not fits.all():
+                    block = block[fits]
+                    counters = counters[fits] if counters is not None else None
+                if len(block):
+                    self._append_block(counters, block.astype(self.dtypes.raw))
+
+        self._dispatch_frames(t_arrival_ns)
+
+    def _check_raw(self, block):
+        """整数原始类型下标记可无损转换的行，其余行计入 rejected_lines (首次出现时提示)"""
+        fits = self.dtypes.raw_fits(block)
+        n_rejected = len(fits) - int(np.count_nonzero(fits))
+        if n_rejected:
+            if not self.rejected_lines:
+                print(f"Warning: sensor {self.sensor_id} received values that do not fit raw dtype "
+                      f"{self.dtypes.raw} (non-integer or out of range); rejecting those lines")
+            self.rejected_lines += n_rejected
+        return fits
+
+    def _read_link(self):
+        """从串口读取字节；连接重建后丢弃旧连接的残留数据"""
+        data = self.link.read()
+        if self.link.generation != self.link_generation:
+            self.link_generation = self.link.generation
+            self._on_reconnect()
+        return data
+
+    def _on_reconnect(self):
+        """串口重连后重新对齐：丢弃半行，时钟模型重新建立，基线保留"""
+        self.raw_buffer.clear()
+        self.rate_estimator.mark_gap()
+        if self.clock_model is not None:
+            # 设备可能已重启，计数器从头开始
+            self.clock_model = ClockModel(self.counter_hz, self.counter_bits)
+
+    def _append_block(self, counters, raw_block):
+        """校准一个原始帧块 (n, num_sensors) 并加入本批次待分发列表"""
+        if self.calibration_done:
+            value_block = self.dtypes.calibrate(raw_block, self.baseline)
+        else:
+            value_block = raw_block.astype(self.dtypes.value)
+        self.latest_data = value_block[-1]
+        self._new_frames.append((counters, raw_block, value_block))
+
+    def _frame_times_ns(self, t_arrival_ns, n):
+        """计算本批次每帧的时间戳(ns)"""
+        t_arrival = t_arrival_ns * 1e-9
+        counters = [c for c, _, _ in self._new_frames]
+        if self.clock_model is not None and all(c is not None for c in counters):
+            times = self.clock_model.update(np.concatenate(counters), t_arrival)
+            return (times * 1e9).astype(np.int64)
+
+        dt_ns = int((self.rate_estimator.mean_dt or 0.0) * 1e9)
+        return t_arrival_ns - (n - 1 - np.arange(n, dtype=np.int64)) * dt_ns
+
+    def _dispatch_frames(self, t_arrival_ns):
+        """更新帧率估计，给本批次的帧打时间戳，写入缓冲区并交给订阅者"""
+        if not self._new_frames:
+            return
+        if len(self._new_frames) == 1:
+            _, raw_block, value_block = self._new_frames[0]
+        else:
+            raw_block = np.concatenate([r for _, r, _ in self._new_frames])
+            value_block = np.concatenate([v for _, _, v in self._new_frames])
+        n = len(raw_block)
+        self.rate_estimator.update(t_arrival_ns * 1e-9, n)
+
+        times_ns = self._frame_times_ns(t_arrival_ns, n)
+        times_list = times_ns.tolist()
+        self.data_buffer.extend(zip(times_list, raw_block))
+        for sink in self.block_sinks:
+            sink(times_ns, value_block)
+        if self.frame_sinks:
+            for t_ns, values in zip(times_list, value_block):
+                for sink in self.frame_sinks:
+                    sink(t_ns, values)
+        self.latest_time_ns = times_list[-1]
+        self._new_frames = []
+
+    def get_metrics(self):
+        """
+        采集链路的运行指标
+
+        latency_s / latency_max_s 为估计的传输附加延迟(平均/本批次最大)，
+        仅在固件提供计数器时可用，否则为 None
+        """
+        metrics = {
+            'frames': self.rate_estimator.frame_count,
+            'rate_hz': self.rate_estimator.rate_hz,
+            'jitter_s': self.rate_estimator.jitter_s,
+            'latency_s': None,
+            'latency_max_s': None,
+            'clock_drift_ppm': None,
+            'bad_lines': self.bad_lines,
+            'rejected_lines': self.rejected_lines,
+        }
+        if self.clock_model is not None and self.clock_model.x0 is not None:
+            metrics['latency_s'] = self.clock_model.latency_s
+            metrics['latency_max_s'] = self.clock_model.latency_max_s
+            metrics['clock_drift_ppm'] = float(self.clock_model.drift_ppm)
+        return metrics
+
+    def add_frame_sink(self, sink):
+        """注册逐帧回调 sink(t, values)，values 为校准后的数据"""
+        self.frame_sinks.append(sink)
+
+    def remove_frame_sink(self, sink):
+        if sink in self.frame_sinks:
+            self.frame_sinks.remove(sink)
+
+    def add_block_sink(self, sink):
+        """注册按批次的回调 sink(times_ns[n], block[n, num_sensors])，避免逐帧调用"""
+        self.block_sinks.append(sink)
+
+    def remove_block_sink(self, sink):
+        if sink in self.block_sinks:
+            self.block_sinks.remove(sink)
+
+    @property
+    def measured_rate_hz(self):
+        """实测的输入帧率(Hz)"""
+        return self.rate_estimator.rate_hz
+
+    @property
+    def measured_jitter_s(self):
+        """实测的帧间隔抖动(s)"""
+        return self.rate_estimator.jitter_s
+
+    def poll(self):
+        """处理串口中已到达的数据（无阻塞），不返回数据"""
+        self._read_and_process()
     
     def read_latest(self):
         """获取最新数据帧（无阻塞）"""
@@ -170,16 +358,29 @@ class SerialDataHandler:
         self.data_buffer.clear()
         print(f"Buffer cleared for sensor {self.sensor_id}")
     
+    def get_link_stats(self):
+        """串口连接状态与重连统计，仿真模式返回 None"""
+        return self.link.get_stats() if self.link is not None else None
+
     def close(self, save_before_close=False):
         """关闭串口连接"""
         if save_before_close:
             self.save_data()
         
-        self.ser.close()
+        if self.link is not None:
+            self.link.close()
         print(f"Closed serial connection for sensor {self.sensor_id}")
 
 class MatrixSerialHandler(SerialDataHandler):
-    def __init__(self, rows=3, cols=4, data_type='int', *args, **kwargs):
+    FRAME_FORMATS = ('plain', 'row_index', 'delimiter')
+    # 每行的标记：>=0 为行号，以下为特殊行
+    TAG_ROW = -1        # 数据行(无行号)
+    TAG_CORRUPT = -2    # 格式错误/行号非法
+    TAG_DELIMITER = -3  # 帧分隔行
+
+    def __init__(self, rows=3, cols=4, data_type='int', *args,
+                 frame_format='plain', frame_delimiter='#', resync_gap_s=0.05,
+                 sim_fault_rate=0.0, **kwargs):
         """
         矩阵串口数据处理程序
         
@@ -187,27 +388,53 @@ class MatrixSerialHandler(SerialDataHandler):
             rows (int): 矩阵行数
             cols (int): 矩阵列数
             data_type (str): 数据类型，'int'或'float'，默认为'int'
+            frame_format (str): 帧边界的识别方式
+                'plain'     每行 cols 个数，按行计数组帧 (旧固件)。格式错误的行仍占一个行位，
+                            整帧丢弃但不会错位；串口空闲超过 resync_gap_s 时丢弃未凑满的行重新对齐。
+                            注意：字节流中没有帧边界信息，整行丢失 (而非乱码) 后之后的每一帧都会错行，
+                            直到出现空闲间隔；连续高速输出时几乎不会有这样的间隔，实际上无法恢复，
+                            启动时也可能从帧中间开始。需要可靠组帧时请让固件输出 'row_index' 或 'delimiter'
+                'row_index' 每行前加行号 0..rows-1，行号 0 为帧起点，行号不连续的帧丢弃
+                'delimiter' 每帧之后发送一行 frame_delimiter，两个分隔行之间恰好 rows 行才是完整帧
+            frame_delimiter (str): 'delimiter' 格式的分隔行内容，'' 表示空行
+            resync_gap_s (float): 'plain' 格式下按空闲间隔重新对齐的阈值，None 关闭
+            sim_fault_rate (float): 仿真模式下每帧出现丢行/乱码的概率，用于测试重同步
         """
+        if frame_format not in self.FRAME_FORMATS:
+            raise ValueError(f"Unknown frame format: {frame_format}")
         # 保存矩阵参数
         self.rows = rows
         self.cols = cols
         self.data_type = data_type.lower()  # 确保小写
+        self.frame_format = frame_format
+        self.frame_delimiter = frame_delimiter.encode()
+        self.resync_gap_s = resync_gap_s
+        self.sim_fault_rate = sim_fault_rate
 
         # 矩阵相关存储
         self.line_counter = 0  # 当前接收的行计数器
-        self.row_buffer = []   # 存储已接收的行数据
+        self.row_buffer = np.empty((0, cols))  # 尚未组成完整帧的行 (m, cols)
+        self.row_tags = np.empty(0, dtype=np.int64)  # 对应每行的标记
+        self.last_data_ns = 0  # 最近一次收到字节的时刻
+        self.synced = False  # 是否已找到过帧边界
+        # 帧完整性统计
+        self.frame_stats = {
+            'frames': 0,           # 完整帧
+            'corrupt_frames': 0,   # 含格式错误行而丢弃的帧
+            'partial_frames': 0,   # 缺行而丢弃的帧
+            'dropped_lines': 0,    # 未进入完整帧的数据行
+        }
         # 计算传感器总数 = 行数 × 列数
         kwargs['num_sensors'] = rows * cols  # 通过kwargs传递num_sensors
 
+        # 原始矩阵类型：整数按 dtypes.raw，浮点按 dtypes.value；校准后统一为 dtypes.value
+        dtypes = kwargs.get('dtypes') or DEFAULT_DTYPES
+        self.matrix_dtype = dtypes.raw if self.data_type == 'int' else dtypes.value
 
         # 调用父类初始化
         super().__init__(*args, **kwargs)  # 不再显式传递num_sensors
-         # 如果数据是整数类型，修改基线和校准值类型为int
-        if self.data_type == 'int':
-            self.baseline = self.baseline.astype(int)
-            self.latest_data = self.latest_data.astype(int)       
         # 最新矩阵数据
-        self.latest_matrix = np.zeros((rows, cols))  # 二维矩阵格式
+        self.latest_matrix = np.zeros((rows, cols), dtype=self.dtypes.value)  # 二维矩阵格式
     
     def _generate_simulated_data(self):
         """生成模拟矩阵数据 (覆盖父类方法)"""
@@ -220,15 +447,27 @@ class MatrixSerialHandler(SerialDataHandler):
         
         # 生成完整矩阵数据的字符串表示
         matrix_lines = []
-        for row in simulated_matrix:
+        for i, row in enumerate(simulated_matrix):
             if self.data_type == 'int':
                 line_str = ' '.join(f"{val}" for val in row)
             else:
                 line_str = ' '.join(f"{val:.2f}" for val in row)
+            if self.frame_format == 'row_index':
+                line_str = f"{i} " + line_str
             matrix_lines.append(line_str)
+        if self.frame_format == 'delimiter':
+            matrix_lines.append(self.frame_delimiter.decode())
+
+        # 注入故障：随机丢一行或把一行变成乱码
+        if self.sim_fault_rate and np.random.random() < self.sim_fault_rate:
+            i = np.random.randint(len(matrix_lines))
+            if np.random.random() < 0.5:
+                del matrix_lines[i]
+            else:
+                matrix_lines[i] = matrix_lines[i][:len(matrix_lines[i]) // 2] + '\x00?'
         
         # 返回所有行数据 + 换行符
-        return '\n'.join(matrix_lines).encode('utf-8')
+        return ('\n'.join(matrix_lines) + '\n').encode('utf-8')
     
     def _read_and_process(self):
         """内部方法：读取并处理串口数据为矩阵格式 (覆盖父类方法)"""
@@ -236,74 +475,224 @@ class MatrixSerialHandler(SerialDataHandler):
         if self.simulate:
             data = self._generate_simulated_data()
         else:
-            data = self.ser.read(self.ser.in_waiting or 1)
+            data = self._read_link()
+        t_arrival_ns = time.monotonic_ns()
         
         if data:
+            # 无帧标记时，串口空闲较久说明上一帧已结束，丢弃残留的半帧
+            if (self.frame_format == 'plain' and self.resync_gap_s is not None and self.last_data_ns
+                    and t_arrival_ns - self.last_data_ns > self.resync_gap_s * 1e9):
+                self._drop_pending()
+            self.last_data_ns = t_arrival_ns
             self.raw_buffer.extend(data)
         
-        # 2. 分割完整数据行
-        while b'\n' in self.raw_buffer:
-            idx = self.raw_buffer.index(b'\n')
-            line_bytes = self.raw_buffer[:idx]
-            del self.raw_buffer[:idx+1]  # 移除已处理部分
-            
-            # 3. 解析单行数据
-            if line_bytes:
-                try:
-                    line = line_bytes.decode().strip()
-                    values = line.split()
-                    
-                    # 只处理包含正确列数的行
-                    if len(values) == self.cols:
-                        # 根据类型转换数据
-                        if self.data_type == 'int':
-                            row_data = [int(val) for val in values]
-                        else:
-                            row_data = [float(val) for val in values]
-                        
-                        self.row_buffer.append(row_data)
-                        self.line_counter += 1
-                        
-                        # 4. 当收集到完整矩阵时处理
-                        if self.line_counter >= self.rows:
-                            # 处理完整矩阵
-                            self._process_full_matrix()
-                            
-                except (UnicodeDecodeError, ValueError) as e:
-                    # 调试信息：打印错误和导致错误的数据
-                    print(f"Error processing data: {e}, Data: {line_bytes}")
-                    pass
-    
+        # 2. 一次取出所有完整行并批量解析，每行打上标记
+        chunk = take_complete_lines(self.raw_buffer)
+        if chunk is not None:
+            rows, tags = self._parse_rows(chunk)
+            if len(tags):
+                self.row_buffer = np.concatenate([self.row_buffer, rows])
+                self.row_tags = np.concatenate([self.row_tags, tags])
+
+                # 3. 按帧边界切分完整矩阵
+                self._process_full_matrix()
+
+        self._dispatch_frames(t_arrival_ns)
+
+    def _parse_rows(self, chunk):
+        """
+        解析一批完整行
+
+        :return: (rows[n, cols], tags[n])，格式错误的行数据为 nan，空行被跳过
+        """
+        with_index = self.frame_format == 'row_index'
+        block, valid = parse_ascii_lines(chunk, self.cols + 1 if with_index else self.cols)
+        rows = np.full((len(valid), self.cols), np.nan)
+        tags = np.full(len(valid), self.TAG_CORRUPT, dtype=np.int64)
+        if with_index:
+            index = block[:, 0]
+            ok = (index >= 0) & (index < self.rows) & (index == np.round(index))
+            lines = np.flatnonzero(valid)
+            rows[lines] = block[:, 1:]
+            tags[lines[ok]] = index[ok]
+        else:
+            rows[valid] = block
+            tags[valid] = self.TAG_ROW
+        rejected = np.zeros(len(valid), dtype=bool)
+        if self.data_type == 'int':
+            # 整数原始类型：含小数/越界的行视为损坏 (计入 rejected_lines)，所在帧整体丢弃
+            lines = np.flatnonzero(tags != self.TAG_CORRUPT)
+            rejected[lines[~self._check_raw(rows[lines])]] = True
+            tags[rejected] = self.TAG_CORRUPT
+
+        keep = ~match_lines(chunk, b'')
+        if self.frame_format == 'delimiter':
+            delimiter = match_lines(chunk, self.frame_delimiter)
+            tags[delimiter] = self.TAG_DELIMITER
+            keep |= delimiter
+        self.bad_lines += int(np.count_nonzero((tags[keep] == self.TAG_CORRUPT) & ~rejected[keep]))
+        return rows[keep], tags[keep]
+
     def _process_full_matrix(self):
-        """处理完整的矩阵数据"""
-        if len(self.row_buffer) < self.rows:
-            return  # 确保有足够的行
-        
-        # 1. 创建二维矩阵
-        matrix_data = np.array(self.row_buffer[:self.rows])
-        
-        # 2. 平展为一维数组（与父类兼容）
-        flat_data = matrix_data.flatten()
-        timestamp = datetime.now()
-        
-        # 3. 更新数据缓冲区和最新数据
-        self.data_buffer.append((timestamp, flat_data))
-        
-        # 4. 更新最新矩阵（校准后/原始）
-        if self.calibration_done:
-            # 更新二维矩阵数据
-            calibrated_matrix = matrix_data - self.baseline.reshape(self.rows, self.cols)
-            self.latest_matrix = calibrated_matrix
-            
-            # 更新父类的一维数据（兼容）
-            self.latest_data = flat_data - self.baseline
+        """把已收集的行按帧边界切分为完整矩阵，丢弃损坏的帧，未结束的帧保留到下一批"""
+        tags = self.row_tags
+        if self.frame_format == 'row_index':
+            starts, consumed = self._frames_by_row_index(tags)
+        elif self.frame_format == 'delimiter':
+            starts, consumed = self._frames_by_delimiter(tags)
         else:
-            self.latest_matrix = matrix_data
-            self.latest_data = flat_data
-        
-        # 5. 重置缓冲区和计数器
-        self.row_buffer = self.row_buffer[self.rows:]  # 保留多余的数据
+            starts, consumed = self._frames_by_count(tags)
+
+        n_data = int(np.count_nonzero(tags[:consumed] != self.TAG_DELIMITER))
+        self.frame_stats['frames'] += len(starts)
+        self.frame_stats['dropped_lines'] += n_data - len(starts) * self.rows
+        if len(starts):
+            # 平展为一维数组（与父类兼容），每行一帧
+            index = starts[:, None] + np.arange(self.rows)
+            flat_block = self.row_buffer[index].reshape(len(starts), self.rows * self.cols)
+            self._append_block(None, flat_block.astype(self.matrix_dtype))
+            # 二维矩阵与最新一帧共享内存
+            self.latest_matrix = self.latest_data.reshape(self.rows, self.cols)
+
+        # 保留未结束的帧
+        self.row_buffer = self.row_buffer[consumed:]
+        self.row_tags = self.row_tags[consumed:]
         self.line_counter = len(self.row_buffer)  # 更新行计数器
+
+    def _count_bad_frame(self, corrupt):
+        """记录一个被丢弃的帧"""
+        self.frame_stats['corrupt_frames' if corrupt else 'partial_frames'] += 1
+
+    def _corrupt_between(self, tags, lo, hi):
+        """各区间 [lo, hi) 内是否含格式错误的行"""
+        bad = np.concatenate([[0], np.cumsum(tags == self.TAG_CORRUPT)])
+        return bad[hi] > bad[lo]
+
+    def _frames_by_count(self, tags):
+        """'plain'：每 rows 行一帧，含错误行的帧整体丢弃 (错误行仍占行位，保持对齐；丢行无法检测)"""
+        n_frames = len(tags) // self.rows
+        starts = np.arange(n_frames) * self.rows
+        corrupt = self._corrupt_between(tags, starts, starts + self.rows)
+        self.frame_stats['corrupt_frames'] += int(np.count_nonzero(corrupt))
+        return starts[~corrupt], n_frames * self.rows
+
+    def _frames_by_row_index(self, tags):
+        """'row_index'：行号 0 开始且行号依次为 0..rows-1 的 rows 行为一帧"""
+        n = len(tags)
+        starts = np.flatnonzero(tags == 0)
+        synced = self.synced
+        self.synced |= len(starts) > 0
+        # 最后一个起点之后行数不足时留待下一批
+        pending = n
+        if len(starts) and starts[-1] + self.rows > n:
+            pending = starts[-1]
+            starts = starts[:-1]
+
+        next_start = np.append(starts[1:], pending).astype(np.intp)
+        window = tags[np.minimum(starts[:, None] + np.arange(self.rows), n - 1)]
+        ok = (window == np.arange(self.rows)).all(axis=1)
+
+        # 起点之后行号不连续：丢行或乱码
+        seg_end = np.minimum(starts + self.rows, next_start)
+        for corrupt in self._corrupt_between(tags, starts[~ok], seg_end[~ok]):
+            self._count_bad_frame(corrupt)
+
+        # 起点行本身丢失/损坏的帧：第一个起点之前、各帧之后多出来的行
+        orphan_lo = np.concatenate([[0], seg_end]).astype(np.intp)
+        orphan_hi = np.append(starts, pending).astype(np.intp)
+        consumed = pending
+        bad_lo, bad_hi = [], []
+        for i, (lo, hi) in enumerate(zip(orphan_lo, orphan_hi)):
+            if hi <= lo or (i == 0 and not synced):
+                continue  # 刚连接时从帧中间开始接收，不计数
+            bounds = self._split_orphans(tags, lo, hi)
+            if hi == n and n - bounds[-1] < self.rows:
+                # 末尾的残帧可能延续到下一批：保留到出现下一个起点时再统计
+                consumed = bounds[-1]
+                bounds = bounds[:-1]
+            if bounds:
+                bad_lo.extend(bounds)
+                bad_hi.extend(bounds[1:] + [consumed if hi == n else hi])
+        for corrupt in self._corrupt_between(tags, np.array(bad_lo, dtype=np.intp),
+                                             np.array(bad_hi, dtype=np.intp)):
+            self._count_bad_frame(corrupt)
+
+        return starts[ok], consumed
+
+    def _split_orphans(self, tags, lo, hi):
+        """
+        把一段没有起点行的行 [lo, hi) 按行号回退处切分为若干帧 (连续丢失多个起点行时不止一帧)
+
+        :return: 各帧在 tags 中的起始下标
+        """
+        bounds = [int(lo)]
+        last = -1
+        for i, tag in enumerate(tags[lo:hi].tolist(), start=int(lo)):
+            if tag >= 0:
+                if tag <= last and i > bounds[-1]:
+                    bounds.append(i)
+                last = tag
+        return bounds
+
+    def _frames_by_delimiter(self, tags):
+        """'delimiter'：两个分隔行之间恰好 rows 个正常行为一帧"""
+        n = len(tags)
+        delimiters = np.flatnonzero(tags == self.TAG_DELIMITER)
+        if len(delimiters) == 0:
+            # 未同步时没有分隔行的数据无法定位；已同步时等待分隔行，超长则丢弃
+            if self.synced and n <= self.rows:
+                return delimiters, 0
+            if self.synced:
+                self._count_bad_frame(True)
+                self.synced = False
+            return delimiters, n
+
+        # 第一个分隔行之前的行：已同步时属于上一批未结束的帧
+        bounds = np.concatenate([[-1], delimiters])
+        lo, hi = bounds[:-1] + 1, bounds[1:]
+        if not self.synced:
+            lo, hi = lo[1:], hi[1:]
+        length = hi - lo
+        corrupt = self._corrupt_between(tags, lo, hi)
+        ok = (length == self.rows) & ~corrupt
+        for is_corrupt, size in zip(corrupt[~ok], length[~ok]):
+            if size:
+                self._count_bad_frame(is_corrupt or size > self.rows)
+        self.synced = True
+
+        # 最后一个分隔行之后的行等待下一个分隔行
+        consumed = delimiters[-1] + 1
+        if n - consumed > self.rows:
+            self._count_bad_frame(True)
+            self.synced = False
+            consumed = n
+        return lo[ok], consumed
+
+    def _on_reconnect(self):
+        super()._on_reconnect()
+        self._drop_pending()
+
+    def _drop_pending(self):
+        """丢弃尚未凑满的半帧 (字节流中断后重新对齐)"""
+        n_data = int(np.count_nonzero(self.row_tags != self.TAG_DELIMITER))
+        if n_data:
+            self._count_bad_frame(bool((self.row_tags == self.TAG_CORRUPT).any()))
+            self.frame_stats['dropped_lines'] += n_data
+        self.row_buffer = self.row_buffer[:0]
+        self.row_tags = self.row_tags[:0]
+        self.line_counter = 0
+        self.raw_buffer.clear()
+
+    def get_frame_stats(self):
+        """帧完整性统计：完整帧数、丢弃的帧数(损坏/缺行)、丢弃的行数"""
+        stats = dict(self.frame_stats)
+        stats['dropped_frames'] = stats['corrupt_frames'] + stats['partial_frames']
+        return stats
+
+    def get_metrics(self):
+        metrics = super().get_metrics()
+        metrics.update(self.get_frame_stats())
+        return metrics
     
     def read_latest_matrix(self):
         """获取最新的二维矩阵数据（无阻塞）"""
@@ -334,6 +723,55 @@ def testMatrixSerialReader():
     while True:
         print(matrix_handler.read_latest_matrix())
 
+def testDeviceCounter():
+    """带设备计数器时一次读到多行：每行一帧，时间戳由计数器映射且单调递增"""
+    handler = SerialDataHandler(num_sensors=2, simulate=True, calibration_frames=0, device_counter=True)
+    batches = iter([b"1 5 6\n2 5 6\n3 7 8\n", b"4 1 2\n5 3 4\n"])
+    handler._generate_simulated_data = lambda: next(batches, b"")
+    handler.poll()
+    time.sleep(0.01)  # 第二批按真实节奏晚于计数器时刻到达
+    handler.poll()
+    times = [t for t, _ in handler.data_buffer]
+    values = np.array([v for _, v in handler.data_buffer])
+    assert len(times) == 5 and np.all(np.diff(times) > 0), times
+    assert np.array_equal(values, [[5, 6], [5, 6], [7, 8], [1, 2], [3, 4]]), values
+    print("device counter: multi-line batches ok")
+
+def testMatrixResync(n_reads=2000, fault_rate=0.1):
+    """仿真注入丢行/乱码，比较三种帧格式的重同步效果 ('plain' 丢行后的错位帧会被计为完整帧)"""
+    for frame_format in MatrixSerialHandler.FRAME_FORMATS:
+        handler = MatrixSerialHandler(rows=3, cols=4, simulate=True, sim_max_value=255,
+                                      calibration_frames=0, frame_format=frame_format,
+                                      sim_fault_rate=fault_rate)
+        for _ in range(n_reads):
+            handler.poll()
+        print(frame_format, handler.get_frame_stats())
+
+def testRowIndexAccounting():
+    """'row_index'：起点行丢失的帧 (包括跨批次、整批没有起点的情况) 都计入丢弃帧"""
+    def rows(*index):
+        return b''.join(f"{i} 5 6\n".encode() for i in index)
+
+    cases = [
+        ([rows(0, 1, 2), rows(1, 2), rows(0, 1, 2, 1, 2), rows(0, 1, 2)], 3, 2),
+        ([rows(0, 1, 2), rows(1, 2, 1, 2), rows(0, 1, 2)], 2, 2),
+        ([rows(0, 1, 2, 1), rows(2), rows(0, 1, 2)], 2, 1),
+        ([rows(1, 2, 0, 1, 2), rows(0, 1), rows(2, 0, 1, 2)], 3, 0),
+    ]
+    for batches, frames, dropped in cases:
+        handler = MatrixSerialHandler(rows=3, cols=2, simulate=True, calibration_frames=0,
+                                      frame_format='row_index')
+        stream = iter(batches)
+        handler._generate_simulated_data = lambda: next(stream, b"")
+        for _ in batches:
+            handler.poll()
+        stats = handler.get_frame_stats()
+        assert (stats['frames'], stats['dropped_frames']) == (frames, dropped), stats
+    print("row_index accounting ok")
+
 if __name__ =='__main__':
     # testSimulateReader()
+    # testMatrixResync()
+    # testDeviceCounter()
+    # testRowIndexAccounting()
     testMatrixSerialReader()
\ No newline at end of file
@@ -0,0 +1,243 @@
+import glob
+import os
+import time
+
+import serial
+from serial.tools import list_ports
+
+BY_ID_DIR = "/dev/serial/by-id"
+
+
+def find_stable_port(port):
+    """
+    查找串口的稳定路径：USB 重新枚举后 /dev/ttyACM0 可能变成 /dev/ttyACM1，
+    而 /dev/serial/by-id/ 下按设备序列号命名的链接保持不变
+
+    :param port: 串口路径
+    :return: 指向同一设备的 by-id 路径，找不到时返回原路径
+    """
+    if port.startswith("/dev/serial/"):
+        return port
+    real = os.path.realpath(port)
+    for link in sorted(glob.glob(os.path.join(BY_ID_DIR, "*"))):
+        if os.path.realpath(link) == real:
+            return link
+    return port
+
+
+def port_hwid(port):
+    """串口对应 USB 设备的 (vid, pid, serial_number)，非 USB 设备返回 None"""
+    real = os.path.realpath(port)
+    for info in list_ports.comports():
+        if os.path.realpath(info.device) == real and info.vid is not None:
+            return info.vid, info.pid, info.serial_number
+    return None
+
+
+def find_port_by_hwid(hwid):
+    """按 (vid, pid, serial_number) 查找重新枚举后的串口路径"""
+    for info in list_ports.comports():
+        if (info.vid, info.pid, info.serial_number) == hwid:
+            return info.device
+    return None
+
+
+class SerialLink:
+    def __init__(self, port, baud_rate=115200, sync_byte=b'\n',
+                 backoff_s=0.02, max_backoff_s=1.0, serial_factory=serial.Serial):
+        """
+        带断线重连的非阻塞串口
+
+        read() 捕获 USB 断开等异常并关闭端口，之后每次 read() 按指数退避尝试重新打开
+        (优先使用 /dev/serial/by-id 稳定路径，其次按 USB VID/PID/序列号查找)，
+        重新打开后丢弃第一个 sync_byte 之前的半行，调用方始终不会收到异常
+
+        Parameters:
+            port (str): 串口路径
+            baud_rate (int): 波特率
+            sync_byte (bytes): 重连后用于重新对齐字节流的分隔符，None 不丢弃
+            backoff_s (float): 首次重连前的等待时间
+            max_backoff_s (float): 重连等待时间上限
+            serial_factory: 打开串口的函数，参数与 serial.Serial 相同
+        """
+        self.port = port
+        self.baud_rate = baud_rate
+        self.sync_byte = sync_byte
+        self.backoff_s = backoff_s
+        self.max_backoff_s = max_backoff_s
+        self.serial_factory = serial_factory
+
+        self.ser = None
+        self.stable_port = find_stable_port(port)
+        self.hwid = None
+        self.generation = 0      # 每次成功(重新)打开加一，调用方据此重置解析状态
+        self.disconnects = 0
+        self.reconnect_attempts = 0
+        self.last_error = None
+        self.last_recovery_s = None  # 最近一次从断开到重新收到数据的时间
+        self._next_attempt = 0.0
+        self._backoff = backoff_s
+        self._lost_at = None
+        self._syncing = False
+
+        self.open()
+
+    @property
+    def connected(self):
+        return self.ser is not None
+
+    def open(self):
+        """打开串口，失败时抛出 serial.SerialException"""
+        path = self.stable_port if os.path.exists(self.stable_port) else self.port
+        if not os.path.exists(path) and self.hwid is not None:
+            path = find_port_by_hwid(self.hwid) or path
+        self.ser = self.serial_factory(path, self.baud_rate, timeout=0)  # 非阻塞模式
+        if self.hwid is None:
+            self.hwid = port_hwid(path)
+        self.generation += 1
+        self._backoff = self.backoff_s
+        self._syncing = self.generation > 1
+
+    def _lost(self, error):
+        """端口出错：关闭并安排重连"""
+        self.last_error = error
+        self.disconnects += 1
+        self._lost_at = time.monotonic()
+        self._next_attempt = self._lost_at + self._backoff
+        try:
+            self.ser.close()
+        except (serial.SerialException, OSError):
+            pass
+        self.ser = None
+        print(f"Serial port {self.port} lost ({error}), reconnecting...")
+
+    def _try_reopen(self):
+        now = time.monotonic()
+        if now < self._next_attempt:
+            return False
+        self.reconnect_attempts += 1
+        try:
+            self.open()
+        except (serial.SerialException, OSError, ValueError) as e:
+            self.last_error = e
+            self._backoff = min(self._backoff * 2, self.max_backoff_s)
+            self._next_attempt = now + self._backoff
+            return False
+        print(f"Serial port {self.port} reconnected after {now - self._lost_at:.3f} s")
+        return True
+
+    def read(self):
+        """读取所有已到达的字节（无阻塞），断开期间返回 b''"""
+        if self.ser is None and not self._try_reopen():
+            return b''
+        try:
+            data = self.ser.read(self.ser.in_waiting or 1)
+        except (serial.SerialException, OSError) as e:
+            self._lost(e)
+            return b''
+
+        if self._syncing and data:
+            # 丢弃重连后第一个分隔符之前的半行
+            if self.sync_byte is not None:
+                idx = data.find(self.sync_byte)
+                if idx < 0:
+                    return b''
+                data = data[idx + len(self.sync_byte):]
+            self._syncing = False
+            self.last_recovery_s = time.monotonic() - self._lost_at
+        return data
+
+    def reconnect(self):
+        """主动断开并立即重连 (保留调用方的基线与缓冲区)"""
+        if self.ser is not None:
+            self._lost("manual reconnect")
+        self._next_attempt = 0.0
+        self._try_reopen()
+
+    def get_stats(self):
+        return {
+            'connected': self.connected,
+            'port': self.ser.port if self.ser is not None else None,
+            'generation': self.generation,
+            'disconnects': self.disconnects,
+            'reconnect_attempts': self.reconnect_attempts,
+            'last_recovery_s': self.last_recovery_s,
+            'last_error': str(self.last_error) if self.last_error else None,
+        }
+
+    def close(self):
+        if self.ser is not None:
+            self.ser.close()
+            self.ser = None
+
+
+def benchmarkReconnect(n_cycles=5, unplug_s=0.1, rate_hz=1000):
+    """
+    用伪终端模拟热插拔：稳定路径是一个符号链接，“重新插入”后指向新的伪终端，
+    测量从断开到重新收到完整数据行的恢复时间 (不含真实 USB 重新枚举的耗时)
+    """
+    import pty
+    import tempfile
+    import threading
+    from utils.serialReader import SerialDataHandler
+
+    link_path = os.path.join(tempfile.mkdtemp(), "ttyTWINTAC")
+    state = {'master': None, 'running': True}
+
+    def plug():
+        master, slave = pty.openpty()
+        tmp = link_path + ".new"
+        os.symlink(os.ttyname(slave), tmp)
+        os.replace(tmp, link_path)
+        os.close(slave)
+        state['master'] = master
+
+    def writer():
+        i = 0
+        while state['running']:
+            master = state['master']
+            if master is not None:
+                try:
+                    os.write(master, f"{i} {i + 1} {i + 2} {i + 3}\n".encode())
+                except OSError:
+                    pass
+            i += 1
+            time.sleep(1.0 / rate_hz)
+
+    plug()
+    threading.Thread(target=writer, daemon=True).start()
+    handler = SerialDataHandler(port=link_path, num_sensors=4, calibration_frames=20)
+    baseline = handler.baseline.copy()
+
+    recoveries = []
+    for _ in range(n_cycles):
+        frames_before = handler.rate_estimator.frame_count
+        while handler.rate_estimator.frame_count < frames_before + 50:
+            handler.poll()
+            time.sleep(0.001)
+        # 拔出：关闭主端，读取端出现 EIO
+        master, state['master'] = state['master'], None
+        os.close(master)
+        t_unplug = time.monotonic()
+        while handler.link.connected:
+            handler.poll()
+            time.sleep(0.001)
+        time.sleep(unplug_s)
+        t_plug = time.monotonic()
+        plug()
+        frames_before = handler.rate_estimator.frame_count
+        while handler.rate_estimator.frame_count == frames_before:
+            handler.poll()
+            time.sleep(0.001)
+        recoveries.append((time.monotonic() - t_plug, time.monotonic() - t_unplug))
+
+    state['running'] = False
+    for plug_s, total_s in recoveries:
+        print(f"replug -> data: {plug_s * 1e3:7.1f} ms   unplug -> data: {total_s * 1e3:7.1f} ms")
+    print("baseline kept:", bool((handler.baseline == baseline).all()))
+    print(handler.link.get_stats())
+    handler.close()
+
+
+if __name__ == '__main__':
+    benchmarkReconnect()
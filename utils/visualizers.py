@@ -1,14 +1,19 @@
 import pyqtgraph as pg
 from pyqtgraph.Qt import QtGui, QtCore, QtWidgets
 import numpy as np
+import time
+
+from utils.rbf_operator import rbf_operator
+from utils.dtype_policy import DEFAULT_DTYPES
 
 pg.setConfigOptions(antialias=True)
 pg.setConfigOption('background', 'k')   # 黑色背景
 pg.setConfigOption('foreground', 'w')   # 白色文字
 
 class TimeSeriesVisualizerPG:
-    def __init__(self, window_sec=5, fs=500, max_value=150):
+    def __init__(self, window_sec=5, fs=500, max_value=150, dtypes=DEFAULT_DTYPES):
         self.fs = fs
+        self.dtypes = dtypes
         self.window_sec = window_sec
         self.window_size = fs * window_sec
 
@@ -17,11 +22,13 @@ class TimeSeriesVisualizerPG:
 
         self.plots = []
         self.curves = []
-        self.history = np.zeros((8, self.window_size))
+        self.history = np.zeros((8, self.window_size), dtype=dtypes.value)
+        self.time_axis = self._make_time_axis(fs)
 
         for i in range(8):
             p = self.win.addPlot(title=f"Channel {i}")
             p.setYRange(0, max_value)
+            p.setLabel('bottom', 'time', units='s')
             p.showGrid(x=True, y=True)
             curve = p.plot(pen=pg.mkPen(color=pg.intColor(i, 8), width=2))
             self.plots.append(p)
@@ -34,10 +41,34 @@ class TimeSeriesVisualizerPG:
         self.history[:, -1] = values
 
         for i in range(8):
-            self.curves[i].setData(self.history[i])
+            self.curves[i].setData(self.time_axis, self.history[i])
+
+        QtWidgets.QApplication.processEvents()
+
+    def update_block(self, block):
+        """一次追加多帧 (n, 8)，只重绘一次"""
+        block = block[-self.window_size:]
+        n = len(block)
+        self.history = np.roll(self.history, -n, axis=1)
+        self.history[:, -n:] = block.T
+
+        for i in range(8):
+            self.curves[i].setData(self.time_axis, self.history[i])
 
         QtWidgets.QApplication.processEvents()
 
+    def _make_time_axis(self, fs):
+        # 最新样本位于 t=0，向左为过去
+        axis = (np.arange(self.window_size) - (self.window_size - 1)) / fs
+        return axis.astype(self.dtypes.value)
+
+    def set_sample_rate(self, fs):
+        """按实测频率更新时间轴（样本缓存长度不变）"""
+        if fs <= 0 or abs(fs - self.fs) < 0.02 * self.fs:
+            return
+        self.fs = fs
+        self.time_axis = self._make_time_axis(fs)
+
 
 class BarVisualizerPG:
     def __init__(self, max_value=150):
@@ -58,4 +89,71 @@ class BarVisualizerPG:
     def update(self, values):
         for i in range(8):
             self.bars[i].setOpts(height=[values[i]])
-        QtWidgets.QApplication.processEvents()
\ No newline at end of file
+        QtWidgets.QApplication.processEvents()
+
+class PressureMapVisualizerPG:
+    def __init__(self, sensor_coords, grid_size=50, max_value=150, margin=5.0, dtypes=DEFAULT_DTYPES):
+        """
+        轻量二维压力图：在传感器 x/z 平面包围盒上取栅格，加载时预计算 RBF 插值矩阵，
+        每帧只做一次矩阵-向量乘法 + 颜色查找表，由 ImageItem 显示
+
+        :param sensor_coords: (N, 3) 传感器坐标 (如 RbfVis.real_sensor_coords)
+        :param grid_size: 栅格在较长边上的像素数
+        :param max_value: 颜色满量程
+        :param margin: 包围盒外扩距离(与坐标同单位)
+        :param dtypes: DtypePolicy，插值矩阵使用 geometry 类型
+        """
+        self.max_value = max_value
+        self.dtypes = dtypes
+        sensor_xz = np.asarray(sensor_coords, dtype=np.float64)[:, [0, 2]]
+
+        # 栅格
+        lo = sensor_xz.min(axis=0) - margin
+        hi = sensor_xz.max(axis=0) + margin
+        span = hi - lo
+        step = span.max() / grid_size
+        self.shape = tuple(int(n) for n in np.maximum(np.round(span / step), 2))
+        xs = np.linspace(lo[0], hi[0], self.shape[0])
+        zs = np.linspace(lo[1], hi[1], self.shape[1])
+        gx, gz = np.meshgrid(xs, zs, indexing='ij')
+        self.weights = rbf_operator(sensor_xz, np.column_stack([gx.ravel(), gz.ravel()]),
+                                    dtype=dtypes.geometry)
+        self.scale = dtypes.geometry.type(255.0 / max_value)
+
+        # 颜色查找表 (浅灰 → 绿 → 红 → 深红)
+        cmap = pg.ColorMap([0.0, 0.1, 0.35, 0.6, 1.0],
+                           [(230, 230, 230), (153, 255, 153), (51, 204, 51), (204, 51, 51), (102, 0, 0)])
+        self.lut = cmap.getLookupTable(0.0, 1.0, 256, alpha=False)
+
+        self.win = pg.GraphicsLayoutWidget(show=True, title="Tactile Pressure Map")
+        self.win.resize(800, 500)
+        self.plot = self.win.addPlot()
+        self.plot.setAspectLocked(True)
+        self.plot.setLabel('bottom', 'x')
+        self.plot.setLabel('left', 'z')
+
+        self.image = pg.ImageItem()
+        self.image.setLookupTable(self.lut)
+        self.image.setImage(np.zeros(self.shape, dtype=np.uint8), levels=(0, 255))
+        self.image.setRect(QtCore.QRectF(lo[0], lo[1], span[0], span[1]))
+        self.plot.addItem(self.image)
+        self.plot.addItem(pg.ScatterPlotItem(sensor_xz[:, 0], sensor_xz[:, 1],
+                                             size=8, brush=pg.mkBrush(255, 0, 0)))
+
+        self.frame_count = 0
+        self.fps_t0 = time.perf_counter()
+
+    def update(self, values):
+        # 一次矩阵-向量乘法得到整张栅格
+        field = self.weights @ np.asarray(values, dtype=self.weights.dtype)
+        index = np.clip(field * self.scale, 0, 255).astype(np.uint8)
+        self.image.setImage(index.reshape(self.shape), autoLevels=False, levels=(0, 255))
+
+        self.frame_count += 1
+        now = time.perf_counter()
+        if now - self.fps_t0 >= 1.0:
+            self.plot.setTitle(f"{self.frame_count / (now - self.fps_t0):.0f} FPS")
+            self.frame_count = 0
+            self.fps_t0 = now
+
+        QtWidgets.QApplication.processEvents()